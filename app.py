@@ -20,6 +20,12 @@ if query:
                 response = res.json()
                 st.markdown("**Answer:**")
                 st.success(response["answer"])
+                # Listing questions come back as typed rows (first page only here)
+                if response.get("rows"):
+                    columns = response.get("columns") or []
+                    st.dataframe([dict(zip(columns, row)) for row in response["rows"]])
+                    if response.get("next_cursor"):
+                        st.caption("More results are available in the web app.")
             else:
                 st.error(f"API Error: {res.status_code}")
         except Exception as e:
@@ -0,0 +1,287 @@
+# answer_templates.py
+#
+# Local, deterministic rendering of natural-language answers from typed SQL
+# rows. Used by the two-stage pipeline where the LLM only writes SQL.
+
+import re
+from decimal import Decimal
+
+# -------------------- Known Inventory Values --------------------
+# Alias in the question -> value stored in t_shirts.brand
+KNOWN_BRANDS = {
+    'van huesen': 'Van Huesen',
+    'adidas': 'Adidas',
+    'nike': 'Nike',
+    'levi': 'Levi',
+}
+
+BRAND_DISPLAY = {'Levi': "Levi's"}
+
+KNOWN_COLORS = ['red', 'blue', 'black', 'white']
+
+# Longest aliases first so "extra large" wins over "large"
+SIZE_ALIASES = [
+    ('extra small', 'XS'), ('extra large', 'XL'), ('small', 'S'), ('medium', 'M'), ('large', 'L'),
+    ('xs', 'XS'), ('xl', 'XL'), ('s', 'S'), ('m', 'M'), ('l', 'L'),
+]
+
+NOT_FOUND_ANSWER = "I couldn't find any matching t-shirts in your inventory."
+UNKNOWN_BRAND_ANSWER = ("I couldn't find any t-shirts from the brand '{brand}' in your inventory. "
+                        "We currently carry Nike, Adidas, Levi, and Van Huesen brands.")
+
+# -------------------- Function: Slot Extraction --------------------
+def _has_word(q: str, word: str) -> bool:
+    return re.search(r"(?<![\w'])" + re.escape(word) + r"(?![\w])", q) is not None
+
+
+def extract_slots(query: str) -> dict:
+    """Extract brand, color and size filters mentioned in a question"""
+    q = query.lower()
+    slots = {'brand': None, 'color': None, 'size': None}
+
+    for alias, brand in KNOWN_BRANDS.items():
+        if alias in q:
+            slots['brand'] = brand
+            break
+
+    for color in KNOWN_COLORS:
+        if _has_word(q, color):
+            slots['color'] = color.capitalize()
+            break
+
+    for alias, size in SIZE_ALIASES:
+        # Single-letter sizes only count when written in upper case ("in M", "size L")
+        if len(alias) == 1:
+            if re.search(r"(?<![\w'])" + alias.upper() + r"(?![\w])", query):
+                slots['size'] = size
+                break
+        elif _has_word(q, alias):
+            slots['size'] = size
+            break
+
+    return slots
+
+# -------------------- Function: Intent Detection --------------------
+# Rankings, comparisons and amounts need ORDER BY / price filters the templates don't have
+UNTEMPLATED_PATTERN = re.compile(
+    r"\b(most|least|fewest|highest|lowest|cheapest|costliest|priciest|expensive|top|best|worst|"
+    r"max|maximum|min|minimum|more than|less than|under|over|below|above|between)\b|[₹$]|\d"
+)
+
+
+def detect_intent(query: str):
+    """Classify a question into one of the templated intents, or None"""
+    q = query.lower()
+    if UNTEMPLATED_PATTERN.search(q):
+        return None
+    mentions_price = re.search(r"\b(price|prices|priced|cost|costs)\b", q) is not None or 'how much does' in q
+    asks_total = (any(w in q for w in ['revenue', 'value', 'worth', 'generate'])
+                  or (mentions_price and re.search(r"\b(total|inventory|all|sell)\b", q) is not None))
+    if 'discount' in q and not asks_total and not mentions_price and 'save' not in q:
+        return 'discount_list'
+    if asks_total:
+        return 'revenue'
+    if mentions_price:
+        # The price of one shirt; discounted unit prices are left to the LLM
+        return None if 'discount' in q else 'unit_price'
+    asks_colors = re.search(r"\bcolou?rs\b", q) is not None or 'what color' in q or 'which color' in q
+    if asks_colors:
+        return 'color_list'
+    if 'how many' in q or 'count' in q or 'stock' in q or 'quantity' in q:
+        return 'count'
+    return None
+
+# -------------------- Function: Template SQL --------------------
+def _where(slots: dict, alias: str = "") -> str:
+    # Slot values only ever come from the fixed known-value lists above
+    prefix = f"{alias}." if alias else ""
+    filters = [f"{prefix}{column} = '{slots[column]}'" for column in ('brand', 'color', 'size') if slots.get(column)]
+    return (" WHERE " + " AND ".join(filters)) if filters else ""
+
+
+def build_template_sql(intent: str, slots: dict, with_discount: bool = False):
+    """Deterministic SQL for a templated intent, or None if the intent has no template"""
+    if intent == 'count':
+        return "SELECT SUM(stock_quantity) FROM t_shirts" + _where(slots)
+    if intent == 'color_list':
+        return "SELECT DISTINCT color FROM t_shirts" + _where(slots)
+    if intent == 'unit_price':
+        return "SELECT DISTINCT price FROM t_shirts" + _where(slots) + " ORDER BY price"
+    if intent == 'revenue' and with_discount:
+        return ("SELECT SUM(t.price * t.stock_quantity * (100 - COALESCE(d.pct_discount, 0)) / 100) "
+                "FROM t_shirts t LEFT JOIN discounts d ON t.t_shirt_id = d.t_shirt_id" + _where(slots, "t"))
+    if intent == 'revenue':
+        return "SELECT SUM(price * stock_quantity) FROM t_shirts" + _where(slots)
+    if intent == 'discount_list':
+        return ("SELECT t.t_shirt_id, d.pct_discount FROM t_shirts t "
+                "JOIN discounts d ON t.t_shirt_id = d.t_shirt_id" + _where(slots, "t"))
+    return None
+
+
+def wants_discount(query: str) -> bool:
+    """True when amounts should have discounts applied ("post discounts", not "without discount")"""
+    q = query.lower()
+    return 'discount' in q and re.search(r"\b((without|no|before|excluding|pre)[- ]discounts?|undiscounted)\b", q) is None
+
+
+# Words a templated question may contain besides brand/color/size values. Anything
+# else ("per", "each", "which brand", dates, ...) asks for more than a template answers.
+TEMPLATE_VOCABULARY = {
+    'how', 'many', 'much', 'what', 'whats', 'is', 'are', 'the', 'a', 'an', 'of', 'for', 'in', 'with', 'on',
+    'do', 'does', 'did', 'we', 'i', 'you', 'our', 'my', 'me', 'have', 'has', 'got', 'left', 'there', 'it',
+    'can', 'could', 'would', 'will', 'be', 'to', 'if', 'and', 'please', 'tell', 'show', 'give', 'get', 'list',
+    'store', 'shop', 'all', 'total', 'currently', 'current', 'right', 'now', 'today', 'any', 's',
+    't', 'shirt', 'shirts', 'tshirt', 'tshirts', 'item', 'items', 'unit', 'units', 'product', 'products',
+    'size', 'color', 'colour', 'colors', 'colours', 'brand', 'available', 'come', 'comes',
+    'stock', 'quantity', 'count', 'inventory', 'sell', 'revenue', 'generate', 'value', 'worth',
+    'price', 'prices', 'priced', 'cost', 'costs', 'one', 'single',
+    'discount', 'discounts', 'discounted', 'undiscounted', 'applied', 'apply', 'post', 'after', 'without',
+    'no', 'before', 'from', 'buy',
+}
+
+
+def template_covers(query: str) -> bool:
+    """True if the question asks for nothing beyond its intent and brand/color/size filters"""
+    q = query.lower()
+    q = re.sub(r"\bwhich colou?rs?\b", " ", q)
+    for alias in list(KNOWN_BRANDS) + KNOWN_COLORS + [alias for alias, _ in SIZE_ALIASES]:
+        q = re.sub(r"(?<![\w'])" + re.escape(alias) + r"(?![\w])", " ", q)
+    return all(word in TEMPLATE_VOCABULARY for word in re.findall(r"[a-z]+", q))
+
+
+def template_sql_for(query: str):
+    """Deterministic SQL for a question, used when the LLM is unavailable.
+
+    Returns None unless the template answers exactly what was asked, so the
+    caller reports that it is busy rather than answering a different question.
+    """
+    intent = detect_intent(query)
+    if intent is None or not template_covers(query):
+        return None
+    return build_template_sql(intent, extract_slots(query), with_discount=wants_discount(query))
+
+# -------------------- Function: Value Formatting --------------------
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def format_number(value) -> str:
+    """1063 -> '1,063', Decimal('31098.000000') -> '31,098', 12.5 -> '12.5'"""
+    if isinstance(value, Decimal) and value == value.to_integral_value():
+        value = int(value)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int):
+        return f"{value:,}"
+    return f"{float(value):,.2f}".rstrip('0').rstrip('.')
+
+
+def format_value(value) -> str:
+    return format_number(value) if _is_number(value) else str(value)
+
+
+def describe_items(slots: dict) -> str:
+    """Build e.g. "Nike XS white" from the extracted slots"""
+    brand = BRAND_DISPLAY.get(slots.get('brand'), slots.get('brand'))
+    words = [brand, slots.get('size'), (slots.get('color') or '').lower() or None]
+    return " ".join(w for w in words if w)
+
+
+def unknown_brand(query: str):
+    """Return a brand name the user asked about that we do not carry, if any"""
+    match = re.search(r"\bbrand\s+([A-Za-z][\w']*(?:\s+[A-Z][\w']*)*)", query)
+    if match and match.group(1).lower() not in KNOWN_BRANDS and match.group(1).lower() not in ('do', 'has', 'is'):
+        return match.group(1)
+    return None
+
+
+AGGREGATE_LABELS = {'sum': 'total', 'count': 'count', 'avg': 'average', 'max': 'max', 'min': 'min'}
+
+
+def column_label(column: str) -> str:
+    """Readable label for a result column: "SUM(stock_quantity)" -> "total stock quantity\""""
+    match = re.fullmatch(r"(\w+)\((?:distinct\s+)?(?:\w+\.)?(\w+|\*)\)", column.strip(), re.IGNORECASE)
+    if match:
+        aggregate = AGGREGATE_LABELS.get(match.group(1).lower(), match.group(1).lower())
+        return aggregate if match.group(2) == '*' else f"{aggregate} {match.group(2).replace('_', ' ')}"
+    return column.replace('_', ' ')
+
+
+def _is_empty(rows: list) -> bool:
+    return not rows or all(all(v is None for v in row) for row in rows)
+
+# -------------------- Function: Render Answer --------------------
+def render_answer(query: str, columns: list, rows: list, intent: str = None, slots: dict = None) -> str:
+    """Turn typed rows into a conversational answer using per-intent templates.
+
+    intent and slots default to what is detected in the question; follow-ups
+    pass the ones carried over from the conversation instead.
+    """
+    intent = intent or detect_intent(query)
+    slots = slots or extract_slots(query)
+    items = describe_items(slots)
+    items_text = f"{items} t-shirts" if items else "t-shirts"
+
+    if _is_empty(rows) or (len(rows) == 1 and len(rows[0]) == 1 and rows[0][0] == 0 and intent == 'count'):
+        brand = unknown_brand(query)
+        if brand:
+            return UNKNOWN_BRAND_ANSWER.format(brand=brand)
+        if intent == 'count' and not _is_empty(rows):
+            return f"You have no {items_text} in stock."
+        return NOT_FOUND_ANSWER
+
+    single = rows[0][0] if len(rows) == 1 and len(rows[0]) == 1 else None
+
+    if intent == 'count' and _is_number(single):
+        return f"You have {format_number(single)} {items_text} in stock."
+
+    if intent == 'color_list' and all(len(row) == 1 for row in rows):
+        colors = [str(row[0]) for row in rows if row[0] is not None]
+        brand = BRAND_DISPLAY.get(slots['brand'], slots['brand'])
+        owner = f"{brand} t-shirts are" if brand else "T-shirts are"
+        if len(colors) == 1:
+            return f"{owner} available in {colors[0]} color."
+        return f"{owner} available in {len(colors)} colors: {', '.join(colors[:-1])} and {colors[-1]}."
+
+    if intent == 'revenue' and _is_number(single):
+        amount = f"₹{format_number(single)}"
+        if wants_discount(query):
+            return f"With current discounts applied, the total value of all {items_text} is {amount}."
+        return f"The total value of all {items_text} is {amount}."
+
+    if intent == 'unit_price' and all(len(row) == 1 and _is_number(row[0]) for row in rows):
+        prices = [row[0] for row in rows]
+        if len(prices) == 1:
+            article = "An" if items_text[0] in "AEIOUaeiou" else "A"
+            return f"{article} {items_text[:-1]} costs ₹{format_number(prices[0])}."
+        low, high = format_number(min(prices)), format_number(max(prices))
+        return f"{items_text[0].upper() + items_text[1:]} cost between ₹{low} and ₹{high}."
+
+    if intent == 'discount_list':
+        pct_index = next((i for i, c in enumerate(columns) if 'discount' in c.lower()), None)
+        if pct_index is not None:
+            lines = []
+            for row in rows:
+                label = " ".join(
+                    f"T-shirt ID {v}" if columns[i].lower().endswith('_id') else format_value(v)
+                    for i, v in enumerate(row) if i != pct_index and v is not None
+                )
+                lines.append(f"{label or 'T-shirt'}: {format_number(row[pct_index])}% discount")
+            return f"Discounts available on {items_text}:\n" + "\n".join(lines)
+
+    # Stock ranking: "Which brand has the most t-shirts in stock?" -> one (name, quantity) row
+    ranking = re.search(r"\b(most|least|fewest)\b", query.lower())
+    if (ranking and len(rows) == 1 and len(rows[0]) == 2 and isinstance(rows[0][0], str)
+            and _is_number(rows[0][1]) and not column_label(columns[1]).startswith('count')
+            and re.search(r"\b(stock|t-?shirts|shirts)\b", query.lower())):
+        amount = "most" if ranking.group(1) == "most" else "fewest"
+        return f"{rows[0][0]} has the {amount} t-shirts in stock with {format_number(rows[0][1])} units."
+
+    # Generic fallback: a single value, or rows labelled with their column names
+    if single is not None:
+        return format_value(single)
+    labels = [column_label(c) for c in columns]
+    return "\n".join(
+        ", ".join(f"{label}: {format_value(v)}" if label else format_value(v) for label, v in zip(labels, row))
+        for row in rows
+    )
@@ -1,12 +1,23 @@
 # api_server.py
 
-from fastapi import FastAPI, Request
+import uuid
+from typing import Any, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from llm_chain import ask_question
+from llm_chain import (ask_listing, ask_question, cache_warmer, change_tracker, debug_endpoints, profiling_enabled,
+                       query_log, remember_question, request_profiler, resolve_follow_up, suggestion_index,
+                       warmup_enabled)
+from pagination import DEFAULT_PAGE_SIZE, decode_cursor, is_listing_query
+from singleflight import SingleFlight, normalize_question
 
 app = FastAPI()
 
+# Identical questions arriving together share one ask_question() call
+question_flight = SingleFlight()
+
 # Allow your Streamlit frontend to access this backend
 app.add_middleware(
     CORSMiddleware,
@@ -16,18 +27,112 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_change_tracking():
+    # Invalidate cached answers as the inventory changes
+    change_tracker.start()
+
+@app.on_event("startup")
+def start_cache_warmup():
+    # Replay popular questions in the background so the first users hit a warm cache
+    if warmup_enabled:
+        cache_warmer.schedule("startup")
+
+@app.on_event("startup")
+def build_suggestion_index():
+    # Index the whole query log once here; /suggest then only adds new questions
+    suggestion_index.refresh()
+
+@app.on_event("shutdown")
+def stop_change_tracking():
+    change_tracker.stop()
+    cache_warmer.stop()
+
 # Request model
 class QuestionRequest(BaseModel):
     query: str
+    cursor: Optional[str] = None  # next_cursor from a previous page of a listing answer
+    page_size: int = DEFAULT_PAGE_SIZE
+    session_id: Optional[str] = None  # keeps context so follow-ups like "and in XL?" work
+    start_session: bool = False  # ask for a new session_id when the client has none yet
 
 # Response model
 class AnswerResponse(BaseModel):
     answer: str
+    columns: Optional[List[str]] = None
+    rows: Optional[List[List[Any]]] = None
+    next_cursor: Optional[str] = None
+    session_id: Optional[str] = None
+    profile_id: Optional[str] = None  # set when this request was profiled, see /debug/profiles
+
+async def run_answer(flight_key: str, profiled: bool, label: str, fn, *args):
+    """Run an answering function, coalesced with identical requests or alone under the profiler"""
+    if profiled:
+        return await run_in_threadpool(request_profiler.run, label, fn, *args)
+    return await question_flight.do(flight_key, fn, *args), None
 
 @app.post("/ask", response_model=AnswerResponse)
-async def ask_api(request: QuestionRequest):
+async def ask_api(request: QuestionRequest, http_request: Request, profile: bool = False):
     query = request.query
     print(f"\n🔍 API REQUEST: {query}")
-    response = ask_question(query)
+
+    requested = profiling_enabled and (profile or http_request.headers.get("X-Profile") == "1")
+    profiled = request_profiler.should_profile(requested)
+
+    # Listing questions come back as pages of typed rows
+    if request.cursor or is_listing_query(query):
+        if request.cursor:
+            try:
+                decode_cursor(request.cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        flight_key = f"{normalize_question(query)}|{request.cursor}|{request.page_size}"
+        result, profile_id = await run_answer(flight_key, profiled, query, ask_listing,
+                                              query, request.cursor, request.page_size)
+        result = {**result, "profile_id": profile_id}
+        print(f"✅ API RESPONSE: {result['answer']} ({len(result.get('rows') or [])} rows)")
+        if not request.cursor and result.get("rows"):
+            await run_in_threadpool(query_log.record, query)
+        return result
+
+    # Follow-ups are answered from the session's previous question where possible.
+    # Sessions are only kept for clients that use them (e.g. not curl or Streamlit).
+    session_id = request.session_id or (uuid.uuid4().hex if request.start_session else None)
+    response, question = None, query
+    if session_id:
+        response, question = await run_in_threadpool(resolve_follow_up, session_id, query)
+    profile_id = None
+    if response is None:
+        response, profile_id = await run_answer(normalize_question(question), profiled, question,
+                                                ask_question, question)
+        failed = response.startswith(("❌", "⚠️"))
+        if session_id and not failed:
+            await run_in_threadpool(remember_question, session_id, question)
+        # Only standalone questions are worth suggesting later, not follow-up fragments
+        if question == query and not failed:
+            await run_in_threadpool(query_log.record, query)
     print(f"✅ API RESPONSE: {response}")
-    return {"answer": response}
+    return {"answer": response, "session_id": session_id, "profile_id": profile_id}
+
+# Suggestion model
+class Suggestion(BaseModel):
+    question: str
+    count: int
+
+class SuggestResponse(BaseModel):
+    suggestions: List[Suggestion]
+
+@app.get("/suggest", response_model=SuggestResponse)
+def suggest_api(q: str = "", limit: int = 5):
+    # Prefix/fuzzy matches from the persisted question log, most frequent and recent first
+    return {"suggestions": suggestion_index.suggest(q, limit=max(1, min(limit, 20)))}
+
+@app.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    # CPU profile and tracemalloc diff captured for one /ask request
+    if not debug_endpoints:
+        raise HTTPException(status_code=404, detail="Not Found")
+    report = request_profiler.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found or expired")
+    return report
@@ -0,0 +1,82 @@
+# benchmark_embeddings.py
+#
+# Compare embedding backends on CPU: startup time (imports + model load),
+# peak resident memory and per-query embedding latency.
+#
+#   python benchmark_embeddings.py                   # both backends
+#   python benchmark_embeddings.py --backends onnx   # a single backend
+#
+# Each backend runs in its own subprocess so import time and memory are
+# measured from a clean interpreter.
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def run_child(backend: str, repeats: int) -> dict:
+    """Measure one backend inside the current (fresh) process"""
+    import resource
+
+    started = time.perf_counter()
+    from embeddings_backend import load_embeddings
+    embeddings = load_embeddings(backend)
+    embeddings.embed_query("warm up")
+    startup = time.perf_counter() - started
+
+    from few_shots import few_shots
+    questions = [example['Question'] for example in few_shots]
+
+    latencies = []
+    for _ in range(repeats):
+        for question in questions:
+            t0 = time.perf_counter()
+            embeddings.embed_query(question)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+
+    return {
+        "backend": backend,
+        "startup_s": round(startup, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "torch_loaded": "torch" in sys.modules,
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["huggingface", "onnx"])
+    parser.add_argument("--repeats", type=int, default=5, help="passes over the few-shot questions")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.repeats)))
+        return
+
+    results = []
+    for backend in args.backends:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--repeats", str(args.repeats)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"❌ {backend}: {proc.stderr.strip().splitlines()[-1]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    header = f"{'backend':<12} {'startup (s)':>12} {'peak RSS (MB)':>14} {'torch':>6} {'p50 (ms)':>9} {'p95 (ms)':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['backend']:<12} {r['startup_s']:>12} {r['peak_rss_mb']:>14} {str(r['torch_loaded']):>6} "
+              f"{r['query_p50_ms']:>9} {r['query_p95_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# change_tracker.py
+#
+# Watches the inventory tables for changes and invalidates only the cached
+# answers that depend on what changed.
+#
+# Preferred source is the trigger-maintained `inventory_changelog` table
+# (see sql/inventory_changelog.sql), which tells us the table, t_shirt_id and
+# brand of every changed row. Without it we fall back to CHECKSUM TABLE
+# polling, which only knows that a table changed.
+
+import re
+import threading
+import time
+
+from answer_templates import KNOWN_BRANDS
+from sql_utils import fetch_rows
+
+TRACKED_TABLES = ['t_shirts', 'discounts']
+CHANGELOG_TABLE = 'inventory_changelog'
+
+# -------------------- Function: Cache Tags --------------------
+def cache_tags_for(query: str, sql: str = None) -> list:
+    """Tags describing which tables and brands a cached answer depends on.
+
+    Every entry gets `table:<name>` for each table it reads, plus either
+    `<table>:brand:<brand>` for each brand it is limited to or
+    `<table>:brand:*` when it spans all brands.
+    """
+    if sql:
+        tables = [t for t in TRACKED_TABLES if re.search(r"\b" + t + r"\b", sql, re.IGNORECASE)]
+        brands = re.findall(r"brand\s*=\s*'([^']+)'", sql, re.IGNORECASE)
+    else:
+        q = query.lower()
+        tables = ['t_shirts', 'discounts'] if 'discount' in q else ['t_shirts']
+        brands = [brand for alias, brand in KNOWN_BRANDS.items() if alias in q]
+
+    tags = []
+    for table in tables or TRACKED_TABLES:
+        tags.append(f"table:{table}")
+        tags.extend(f"{table}:brand:{brand}" for brand in sorted(set(brands)) or ['*'])
+    return tags
+
+
+def tags_for_change(table: str, brand: str = None) -> list:
+    """Tags to invalidate when rows of `table` for `brand` (None = unknown) change"""
+    if brand is None:
+        return [f"table:{table}"]
+    return [f"{table}:brand:{brand}", f"{table}:brand:*"]
+
+# -------------------- Class: ChangeTracker --------------------
+class ChangeTracker:
+    """Poll for inventory changes and invalidate affected cache entries.
+
+    Listeners registered with add_listener() are called with a dict mapping
+    each changed table to the set of changed brands (None meaning unknown),
+    e.g. to re-warm the cache after a stock update.
+    """
+
+    def __init__(self, db, cache, poll_interval: float = 5.0, purge_interval: float = 600.0):
+        self.db = db
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self.last_purge = 0.0
+        self.listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.mode = None
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _detect_mode(self) -> str:
+        _, rows = fetch_rows(
+            self.db,
+            "SELECT COUNT(*) FROM information_schema.tables "
+            f"WHERE table_schema = DATABASE() AND table_name = '{CHANGELOG_TABLE}'",
+        )
+        return "changelog" if rows[0][0] else "checksum"
+
+    def _read_changelog(self) -> dict:
+        last_id = self.cache.get_meta("changelog_last_id")
+        if last_id is None:
+            # First run against this cache file: we cannot know what is stale
+            _, rows = fetch_rows(self.db, f"SELECT COALESCE(MAX(id), 0) FROM {CHANGELOG_TABLE}")
+            self.cache.set_meta("changelog_last_id", int(rows[0][0]))
+            self.cache.clear("answer")
+            return {}
+
+        _, rows = fetch_rows(
+            self.db,
+            f"SELECT id, table_name, t_shirt_id, brand FROM {CHANGELOG_TABLE} "
+            f"WHERE id > {int(last_id)} ORDER BY id LIMIT 5000",
+        )
+        changes = {}
+        for change_id, table, _t_shirt_id, brand in rows:
+            changes.setdefault(table, set()).add(brand)
+            last_id = change_id
+        self.cache.set_meta("changelog_last_id", int(last_id))
+        return changes
+
+    def _read_checksums(self) -> dict:
+        _, rows = fetch_rows(self.db, "CHECKSUM TABLE " + ", ".join(TRACKED_TABLES))
+        known = self.cache.get_meta("table_checksums", {})
+        current = {table.split(".")[-1]: checksum for table, checksum in rows}
+        self.cache.set_meta("table_checksums", current)
+        if not known:
+            self.cache.clear("answer")
+            return {}
+        return {table: {None} for table, checksum in current.items() if known.get(table) != checksum}
+
+    def poll_once(self) -> dict:
+        """Check for changes once, invalidate affected entries and notify listeners"""
+        if self.mode is None:
+            self.mode = self._detect_mode()
+            print(f"🔄 CHANGE TRACKING: {self.mode} mode")
+
+        changes = self._read_changelog() if self.mode == "changelog" else self._read_checksums()
+        if not changes:
+            return changes
+
+        tags = sorted({tag for table, brands in changes.items() for brand in brands
+                       for tag in tags_for_change(table, brand)})
+        removed = self.cache.invalidate_tags(tags)
+        print(f"🔄 INVENTORY CHANGED: {changes} -> invalidated {removed} cached answers")
+
+        for listener in self.listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                print(f"❌ Change listener failed: {str(e)}")
+        return changes
+
+    def purge_if_due(self):
+        """Delete expired cache rows every purge_interval seconds (reads only skip them)"""
+        if time.monotonic() - self.last_purge < self.purge_interval:
+            return
+        self.last_purge = time.monotonic()
+        removed = self.cache.purge_expired()
+        if removed:
+            print(f"🧹 CACHE PURGE: removed {removed} expired entries")
+
+    def _run(self):
+        while True:
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"❌ Change tracking error: {str(e)}")
+            try:
+                self.purge_if_due()
+            except Exception as e:
+                print(f"❌ Cache purge error: {str(e)}")
+            if self._stop.wait(self.poll_interval):
+                return
+
+    def start(self):
+        if self._thread is None and self.poll_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="change-tracker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
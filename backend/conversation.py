@@ -0,0 +1,82 @@
+# conversation.py
+#
+# Session-scoped conversation context. Remembers the intent, slots and SQL of
+# the last question in a session so short follow-ups ("and in XL?", "what
+# about Adidas?") can be answered by rewriting the previous query's filters
+# locally instead of going back to the LLM.
+
+import re
+
+from answer_templates import detect_intent, extract_slots, wants_discount
+
+FOLLOW_UP_LEADS = ('and ', 'what about ', 'how about ', 'only ', 'just ', 'in ', 'for ', 'with ', 'now ')
+
+SLOT_COLUMNS = ('brand', 'color', 'size')
+
+# -------------------- Class: SessionStore --------------------
+class SessionStore:
+    """Per-session context kept in the shared cache so every worker sees it"""
+
+    def __init__(self, cache, ttl: float = 1800):
+        self.cache = cache
+        self.ttl = ttl
+
+    def get(self, session_id: str):
+        return self.cache.get("session", session_id) if session_id else None
+
+    def save(self, session_id: str, context: dict):
+        self.cache.set("session", session_id, context, ttl=self.ttl)
+
+
+def build_context(question: str, sql: str = None, intent: str = None, slots: dict = None) -> dict:
+    return {
+        'question': question,
+        'intent': intent if intent is not None else detect_intent(question),
+        'slots': slots if slots is not None else extract_slots(question),
+        'with_discount': wants_discount(question),
+        'sql': sql,
+    }
+
+# -------------------- Function: Follow-up Detection --------------------
+def is_follow_up(query: str) -> bool:
+    """A follow-up names new filter values but no intent of its own"""
+    q = query.strip().lower()
+    if not any(extract_slots(query).values()) or detect_intent(query) is not None:
+        return False
+    return q.startswith(FOLLOW_UP_LEADS) or len(q.split()) <= 3
+
+
+def merge_slots(previous: dict, query: str) -> dict:
+    """Previous slots overridden by any slot the follow-up mentions"""
+    merged = dict(previous)
+    merged.update({k: v for k, v in extract_slots(query).items() if v})
+    return merged
+
+# -------------------- Function: Local Query Rewriting --------------------
+def rewrite_sql_filters(sql: str, changes: dict) -> str:
+    """Replace (or add) `column = 'value'` filters in the previous SQL.
+
+    Only the brand/color/size columns are touched; their values come from the
+    fixed known-value lists, so they are safe to inline.
+    """
+    for column, value in changes.items():
+        if column not in SLOT_COLUMNS or not value:
+            continue
+        pattern = re.compile(r"((?:\b\w+\.)?`?" + column + r"`?\s*=\s*)'[^']*'", re.IGNORECASE)
+        if pattern.search(sql):
+            sql = pattern.sub(lambda m: f"{m.group(1)}'{value}'", sql)
+        elif re.search(r"\bWHERE\b", sql, re.IGNORECASE):
+            sql = re.sub(r"\bWHERE\b", f"WHERE {column} = '{value}' AND", sql, count=1, flags=re.IGNORECASE)
+        else:
+            match = re.search(r"\s+(GROUP\s+BY|ORDER\s+BY|LIMIT)\b", sql, re.IGNORECASE)
+            position = match.start() if match else len(sql)
+            sql = f"{sql[:position]} WHERE {column} = '{value}'{sql[position:]}"
+    return sql
+
+
+def rewrite_question(context: dict, query: str) -> str:
+    """Fold a follow-up into the previous question, for when it has to go to the LLM"""
+    new_slots = {k: v for k, v in extract_slots(query).items() if v}
+    details = ", ".join(f"{column} {value}" for column, value in new_slots.items())
+    replaces = any(context['slots'].get(column) for column in new_slots)
+    return f"{context['question'].rstrip('?. ')} (with {details}{' instead' if replaces else ''})?"
@@ -0,0 +1,100 @@
+# embeddings_backend.py
+#
+# Embedding model factory. The default backend is HuggingFaceEmbeddings
+# (sentence-transformers on PyTorch); the optional "onnx" backend runs an
+# int8-quantized export of the same model on ONNX Runtime, which avoids
+# importing torch in every worker.
+
+import os
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Quantized exports published in the model repository on the Hugging Face Hub
+ONNX_MODEL_FILE = "onnx/model_quint8_avx2.onnx"
+ONNX_TOKENIZER_FILE = "tokenizer.json"
+
+# -------------------- Class: OnnxEmbeddings --------------------
+class OnnxEmbeddings(Embeddings):
+    """all-MiniLM-L6-v2 on ONNX Runtime: mean pooling + L2 normalisation.
+
+    Produces the same vectors (up to quantization error) as the
+    sentence-transformers pipeline, so the Chroma store and few-shot
+    selection behave the same.
+    """
+
+    def __init__(self, model_path: str = None, tokenizer_path: str = None,
+                 model_name: str = EMBEDDING_MODEL, max_length: int = 256, batch_size: int = 32):
+        try:
+            import numpy as np
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The onnx embeddings backend needs onnxruntime and tokenizers: "
+                "pip install onnxruntime tokenizers"
+            ) from e
+
+        if model_path is None or tokenizer_path is None:
+            from huggingface_hub import hf_hub_download
+            model_path = model_path or hf_hub_download(model_name, ONNX_MODEL_FILE)
+            tokenizer_path = tokenizer_path or hf_hub_download(model_name, ONNX_TOKENIZER_FILE)
+
+        self._np = np
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(os.getenv("EMBEDDINGS_THREADS", "1"))
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        np = self._np
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(ids)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+            weights = mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+# -------------------- Function: Quantize An Export --------------------
+def quantize_onnx_model(source_path: str, target_path: str) -> str:
+    """Dynamic int8 quantization of an fp32 ONNX export (e.g. onnx/model.onnx)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QUInt8)
+    return target_path
+
+# -------------------- Function: Embeddings Factory --------------------
+def load_embeddings(backend: str = None) -> Embeddings:
+    """Return the embeddings model selected by EMBEDDINGS_BACKEND ("huggingface" or "onnx")"""
+    backend = (backend or os.getenv("EMBEDDINGS_BACKEND", "huggingface")).lower()
+    if backend == "onnx":
+        return OnnxEmbeddings(
+            model_path=os.getenv("EMBEDDINGS_ONNX_MODEL") or None,
+            tokenizer_path=os.getenv("EMBEDDINGS_ONNX_TOKENIZER") or None,
+        )
+    if backend in ("huggingface", "hf"):
+        # Imported lazily so the onnx backend never pulls in torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    raise ValueError(f"Unknown EMBEDDINGS_BACKEND '{backend}', expected 'huggingface' or 'onnx'")
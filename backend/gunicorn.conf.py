@@ -0,0 +1,33 @@
+# gunicorn.conf.py
+#
+# Multi-process deployment:
+#
+#   cd backend
+#   gunicorn api_server:app -c gunicorn.conf.py
+#
+# The app (LLM client, embedding model, Chroma store) is imported once in the
+# master process and then forked, so workers share those pages copy-on-write
+# instead of each loading its own copy. Answer/SQL caches live in the shared
+# SQLite file (CACHE_PATH), so a hit in one worker is a hit in all of them.
+
+import gc
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far into the permanent generation so the
+    # garbage collector does not write to (and un-share) those pages in children
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections in the SQLAlchemy pool must not be shared across processes;
+    # drop the parent's without closing them so each worker opens its own
+    import llm_chain
+    llm_chain.db._engine.dispose(close=False)
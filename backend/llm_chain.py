@@ -1,14 +1,27 @@
 import os
+import threading
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import FewShotPromptTemplate, PromptTemplate
 from langchain_community.vectorstores import Chroma
 from langchain.prompts.example_selector import SemanticSimilarityExampleSelector
 from langchain_experimental.sql import SQLDatabaseChain
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.utilities import SQLDatabase
 
 from few_shots import few_shots
+from embeddings_backend import load_embeddings
+from prompt_budget import build_compact_prompt, clear_inline_values, count_tokens
+from sql_utils import extract_sql, fetch_rows, is_select
+from answer_templates import NOT_FOUND_ANSWER, build_template_sql, render_answer, template_sql_for
+from query_log import QueryLog, SuggestionIndex
+from warmup import CacheWarmer, warmup_questions
+from profiling import RequestProfiler
+from conversation import SessionStore, build_context, is_follow_up, merge_slots, rewrite_question, rewrite_sql_filters
+from llm_client import CircuitBreaker, LLMUnavailableError, ResilientChatModel, TokenBucket
+from shared_cache import SharedCache
+from change_tracker import ChangeTracker, cache_tags_for
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, fetch_page, plan_id_for, row_cap
+from singleflight import normalize_question
 
 # -------------------- Load Environment Variables --------------------
 load_dotenv()
@@ -27,11 +40,69 @@ if not api_key:
 if not db_password:
     raise ValueError("DB_PASSWORD is required but not found in .env file")
 
+# Prompt compaction: question-aware schema and adaptive few-shot k
+prompt_compact = os.getenv("PROMPT_COMPACT", "false").lower() in ("1", "true", "yes")
+prompt_min_k = int(os.getenv("PROMPT_MIN_K", "1"))
+prompt_max_k = int(os.getenv("PROMPT_MAX_K", "3"))
+prompt_min_score = float(os.getenv("PROMPT_MIN_SCORE", "0.5"))
+
+# Two-stage generation: LLM writes SQL only, answers are rendered locally
+sql_only_mode = os.getenv("SQL_ONLY_MODE", "false").lower() in ("1", "true", "yes")
+
+# Gemini quota handling: token bucket, retries, per-call deadline, circuit breaker
+llm_requests_per_minute = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "10"))
+llm_burst = int(os.getenv("LLM_BURST", "3"))
+llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", "3"))
+llm_call_timeout = float(os.getenv("LLM_CALL_TIMEOUT", "60"))
+llm_breaker_threshold = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+llm_breaker_reset = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Answer/SQL caches shared by all worker processes on the host
+cache_path = os.getenv("CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tquery_cache.sqlite3"))
+answer_cache_ttl = float(os.getenv("ANSWER_CACHE_TTL", "300"))
+sql_cache_ttl = float(os.getenv("SQL_CACHE_TTL", "86400"))
+listing_plan_ttl = float(os.getenv("LISTING_PLAN_TTL", "3600"))
+session_ttl = float(os.getenv("SESSION_TTL", "1800"))
+
+# Persisted question log behind /suggest (kept apart from the cache so it survives cache resets)
+query_log_path = os.getenv("QUERY_LOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tquery_queries.sqlite3"))
+
+# Cache pre-warming on startup and after inventory changes
+warmup_enabled = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+warmup_top_n = int(os.getenv("WARMUP_TOP_N", "20"))
+warmup_include_few_shots = os.getenv("WARMUP_INCLUDE_FEW_SHOTS", "true").lower() in ("1", "true", "yes")
+warmup_llm_reserve = float(os.getenv("WARMUP_LLM_RESERVE", "2"))
+
+# Per-request profiling: opt-in via /ask?profile=1 or X-Profile: 1, plus random sampling
+profiling_enabled = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+profile_sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+profiler_backend = os.getenv("PROFILER", "cprofile").lower()
+debug_endpoints = os.getenv("DEBUG_ENDPOINTS", "false").lower() in ("1", "true", "yes")
+
+# Seconds between inventory change checks (0 disables change tracking)
+change_poll_interval = float(os.getenv("CHANGE_POLL_INTERVAL", "5"))
+
+# -------------------- Shared Cache --------------------
+cache = SharedCache(cache_path)
+
 # -------------------- Load LLM --------------------
-llm = ChatGoogleGenerativeAI(
+gemini = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash",
     google_api_key=api_key,
     temperature=0.2,
+    timeout=llm_call_timeout,
+    max_retries=1,  # retries are handled by ResilientChatModel
+)
+
+# Kept in the shared cache file so the quota holds across all worker processes
+llm_bucket = TokenBucket(llm_requests_per_minute, llm_burst, store=cache)
+llm_breaker = CircuitBreaker(llm_breaker_threshold, llm_breaker_reset)
+llm = ResilientChatModel(
+    inner=gemini,
+    bucket=llm_bucket,
+    breaker=llm_breaker,
+    max_retries=llm_max_retries,
+    call_deadline=llm_call_timeout,
 )
 
 # -------------------- Load MySQL Database --------------------
@@ -41,8 +112,16 @@ encoded_password = quote_plus(db_password)
 db_uri = f"mysql+mysqlconnector://{db_user}:{encoded_password}@{db_host}:{db_port}/{db_name}"
 db = SQLDatabase.from_uri(db_uri)
 
+# -------------------- Change Tracking, Sessions & Query Log --------------------
+change_tracker = ChangeTracker(db, cache, poll_interval=change_poll_interval)
+change_tracker.add_listener(clear_inline_values)
+sessions = SessionStore(cache, ttl=session_ttl)
+query_log = QueryLog(query_log_path)
+suggestion_index = SuggestionIndex(query_log)
+request_profiler = RequestProfiler(cache, sample_rate=profile_sample_rate, backend=profiler_backend)
+
 # -------------------- Setup Few-Shot Embedding & VectorStore --------------------
-embeddings = HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
+embeddings = load_embeddings()
 to_vectorize = [" ".join(example.values()) for example in few_shots]
 vectorstore = Chroma.from_texts(to_vectorize, embeddings, metadatas=few_shots)
 
@@ -100,6 +179,94 @@ few_shot_prompt = FewShotPromptTemplate(
     input_variables=["input", "table_info", "top_k"],
 )
 
+# -------------------- Function: Prompt Selection --------------------
+def get_prompt(query: str, sql_only: bool = False):
+    """Return the few-shot prompt for a query, compacted when PROMPT_COMPACT is enabled"""
+    if not prompt_compact:
+        return few_shot_prompt
+
+    return build_compact_prompt(
+        db, vectorstore, query,
+        sql_only=sql_only,
+        min_k=prompt_min_k,
+        max_k=prompt_max_k,
+        min_score=prompt_min_score,
+    )
+
+# -------------------- Function: SQL Tracking --------------------
+# SQL run while answering the current question (per thread), so the answer
+# cache can be tagged with the tables and brands the answer actually read
+_answer_sql = threading.local()
+
+
+def note_sql(sql_query: str):
+    statements = getattr(_answer_sql, "statements", None)
+    if statements is not None:
+        statements.append(sql_query)
+
+
+def chain_sql(result: dict):
+    """The SQL a SQLDatabaseChain run executed, from its intermediate steps (None if it did not run any)"""
+    steps = result.get("intermediate_steps", [])
+    if len(steps) >= 4 and isinstance(steps[1], str) and is_select(extract_sql(steps[1])):
+        return extract_sql(steps[1])
+    return None
+
+# -------------------- Function: Two-Stage Answer --------------------
+def build_sql_prompt(query: str) -> str:
+    """Format the SQL-only prompt text for a query"""
+    prompt = get_prompt(query, sql_only=True)
+    prompt_inputs = {"input": query, "top_k": "5"}
+    if "table_info" in prompt.input_variables:
+        prompt_inputs["table_info"] = db.get_table_info()
+    prompt_text = prompt.format(**prompt_inputs)
+    print(f"🧮 PROMPT TOKENS: {count_tokens(prompt_text)}")
+    return prompt_text
+
+
+def generate_sql(query: str) -> str:
+    """Ask the LLM for the SQL query only, stopping before SQLResult:"""
+    response = llm.invoke(build_sql_prompt(query), stop=["\nSQLResult:"])
+    return extract_sql(response.content)
+
+
+def answer_two_stage(query: str) -> str:
+    """Generate SQL with one LLM call, run it, and render the answer from typed rows"""
+    cache_key = normalize_question(query)
+    sql_query = cache.get("sql", cache_key)
+    if sql_query:
+        print(f"⚡ SQL CACHE HIT: {query}")
+    else:
+        sql_query = generate_sql(query)
+
+    if not is_select(sql_query):
+        # The model answered in natural language (e.g. refused the question)
+        return sql_query
+
+    print(f"📊 SQL QUERY: {sql_query}")
+    columns, rows = fetch_rows(db, sql_query)
+    print(f"📋 SQL RESULT: {rows}")
+    note_sql(sql_query)
+    # Only SQL that ran is reused; a failing query gets a fresh attempt next time
+    cache.set("sql", cache_key, sql_query, ttl=sql_cache_ttl)
+    return render_answer(query, columns, rows)
+
+# -------------------- Function: Degraded Answer --------------------
+def answer_without_llm(query: str) -> str:
+    """Answer from the deterministic template path while the LLM is unavailable"""
+    sql_query = template_sql_for(query)
+    if not sql_query:
+        return "⚠️ The assistant is busy right now. Please try again in a minute."
+
+    print(f"📊 SQL QUERY (template): {sql_query}")
+    try:
+        columns, rows = fetch_rows(db, sql_query)
+    except Exception as e:
+        return f"Error executing query: {str(e)}"
+    print(f"📋 SQL RESULT: {rows}")
+    note_sql(sql_query)
+    return render_answer(query, columns, rows)
+
 # -------------------- Function: Query Relevance Filter --------------------
 def is_database_related_query(query: str) -> bool:
     # Specific t-shirt related keywords
@@ -300,8 +467,6 @@ def split_multipart_query(query: str) -> list:
 # -------------------- Function: Multi-part Query Handler --------------------
 def handle_multipart_query(query: str) -> str:
     """Handle queries with multiple parts by breaking them down and answering each"""
-    import time
-    
     parts = split_multipart_query(query)
     
     if len(parts) <= 1:
@@ -311,16 +476,21 @@ def handle_multipart_query(query: str) -> str:
     for i, part in enumerate(parts, 1):
         try:
             # Process each part individually
-            if is_database_related_query(part):
+            if is_database_related_query(part) and sql_only_mode:
+                answers.append(f"**Question {i}:** {part.capitalize()}\n**Answer:** {answer_two_stage(part)}")
+            elif is_database_related_query(part):
                 chain = SQLDatabaseChain.from_llm(
                     llm=llm,
                     db=db,
-                    prompt=few_shot_prompt,
+                    prompt=get_prompt(part),
                     return_intermediate_steps=True,
                     verbose=False
                 )
                 
                 result = chain.invoke({"query": part})
+                part_sql = chain_sql(result)
+                if part_sql:
+                    note_sql(part_sql)
                 
                 # Extract answer
                 if 'result' in result:
@@ -329,6 +499,7 @@ def handle_multipart_query(query: str) -> str:
                         clean_answer = answer.split("Answer:")[-1].strip()
                     elif answer.upper().strip().startswith('SELECT'):
                         sql_result = db.run(answer)
+                        note_sql(answer)
                         clean_answer = str(sql_result).replace("[", "").replace("]", "").replace("(", "").replace(")", "").replace(",", "").replace("'", "").replace("Decimal", "").strip()
                     else:
                         clean_answer = answer
@@ -350,17 +521,149 @@ def handle_multipart_query(query: str) -> str:
                     answers.append(f"**Question {i}:** {part.capitalize()}\n**Answer:** Could not process this part")
             else:
                 answers.append(f"**Question {i}:** {part.capitalize()}\n**Answer:** This part is not related to our t-shirt inventory")
+        except LLMUnavailableError as e:
+            print(f"⚠️ LLM unavailable, using template path: {str(e)}")
+            answers.append(f"**Question {i}:** {part.capitalize()}\n**Answer:** {answer_without_llm(part)}")
         except Exception as e:
             answers.append(f"**Question {i}:** {part.capitalize()}\n**Answer:** Error processing: {str(e)}")
-        
-        # Add small delay between parts to avoid rate limiting
-        if i < len(parts):  # Don't delay after the last part
-            time.sleep(1)
     
     return "🔍 **Multi-part Query Detected** - Breaking it down:\n\n" + "\n\n".join(answers)
 
+# -------------------- Function: Paginated Listing --------------------
+def listing_sql_for(query: str):
+    """SQL for a listing question, from the SQL cache, the LLM or (if it is unavailable) a template.
+
+    Returns (sql, generated); generated is True when the LLM just wrote the
+    SQL, which the caller caches once it has run successfully.
+    """
+    sql_query = cache.get("sql", normalize_question(query))
+    if sql_query:
+        return sql_query, False
+    try:
+        return generate_sql(query), True
+    except LLMUnavailableError as e:
+        print(f"⚠️ LLM unavailable, using template path: {str(e)}")
+        return template_sql_for(query), False
+
+
+def ask_listing(query: str, cursor: str = None, page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+    """Answer a listing question one page of typed rows at a time.
+
+    The first call stores the SQL under a plan id; the returned next_cursor
+    ("<plan id>.<offset>") fetches the following page from any worker.
+    Raises ValueError for a malformed cursor; any other failure is reported
+    in the answer, as answer_question does.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    if cursor:
+        plan_id, offset = decode_cursor(cursor)
+
+    try:
+        if cursor:
+            plan = cache.get("plan", plan_id)
+            if plan is None:
+                return {"answer": "⚠️ These results have expired. Please ask the question again."}
+            sql_query, max_rows = plan["sql"], plan.get("max_rows")
+        else:
+            if not is_database_related_query(query) or not is_complete_question(query):
+                # Let the regular path produce its rejection or guidance message
+                return {"answer": ask_question(query)}
+            sql_query, generated = listing_sql_for(query)
+            if not sql_query or not is_select(sql_query):
+                return {"answer": sql_query or "⚠️ The assistant is busy right now. Please try again in a minute."}
+            max_rows = row_cap(query, sql_query)
+            plan_id, offset = plan_id_for(f"{sql_query}|{max_rows}"), 0
+            cache.set("plan", plan_id, {"sql": sql_query, "query": query, "max_rows": max_rows},
+                      ttl=listing_plan_ttl)
+
+        print(f"📊 SQL QUERY (page at {offset}): {sql_query}")
+        columns, rows, has_more = fetch_page(db, sql_query, offset, page_size, max_rows=max_rows)
+        if not cursor and generated:
+            cache.set("sql", normalize_question(query), sql_query, ttl=sql_cache_ttl)
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return {"answer": f"❌ Error: {str(e)}"}
+
+    if rows:
+        answer = f"Showing results {offset + 1}–{offset + len(rows)}" + ("; more available." if has_more else ".")
+    else:
+        answer = NOT_FOUND_ANSWER if offset == 0 else "No more results."
+    return {
+        "answer": answer,
+        "columns": columns,
+        "rows": [list(row) for row in rows],
+        "next_cursor": encode_cursor(plan_id, offset + len(rows)) if has_more else None,
+    }
+
+# -------------------- Function: Conversation Follow-ups --------------------
+def resolve_follow_up(session_id: str, query: str):
+    """Resolve a follow-up against the session's previous question.
+
+    Returns (answer, question). answer is set when the follow-up could be
+    answered locally by rewriting the previous query's filters; otherwise it is
+    None and question is the text to send through ask_question (the follow-up
+    folded into the previous question, or the query unchanged).
+    """
+    context = sessions.get(session_id)
+    if not context or not is_follow_up(query):
+        return None, query
+
+    slots = merge_slots(context['slots'], query)
+    changes = {k: v for k, v in slots.items() if v != context['slots'].get(k)}
+    sql_query = None
+    if context.get('sql'):
+        # Same query as last time, with the follow-up's filters swapped in
+        sql_query = rewrite_sql_filters(context['sql'], changes)
+    elif context['intent'] and template_sql_for(context['question']):
+        sql_query = build_template_sql(context['intent'], slots, with_discount=context['with_discount'])
+    if sql_query is None:
+        return None, rewrite_question(context, query)
+
+    print(f"💬 FOLLOW-UP: {query} -> {slots}")
+    print(f"📊 SQL QUERY (follow-up): {sql_query}")
+    try:
+        columns, rows = fetch_rows(db, sql_query)
+    except Exception as e:
+        print(f"❌ Follow-up rewrite failed, asking the LLM instead: {str(e)}")
+        return None, rewrite_question(context, query)
+
+    answer = render_answer(context['question'], columns, rows, intent=context['intent'], slots=slots)
+    sessions.save(session_id, build_context(context['question'], sql=sql_query,
+                                            intent=context['intent'], slots=slots))
+    return answer, query
+
+
+def remember_question(session_id: str, query: str):
+    """Record a fully answered question as the session's context for follow-ups"""
+    sql_query = cache.get("sql", normalize_question(query))
+    sessions.save(session_id, build_context(query, sql=sql_query))
+
 # -------------------- Function: Ask Question --------------------
+# Answers that describe a failure are never cached
+UNCACHEABLE_PREFIXES = ("❌", "⚠️", "Error", "I had trouble", "I processed your question")
+
+
 def ask_question(query: str) -> str:
+    """Answer a question, serving repeats from the shared answer cache"""
+    cache_key = normalize_question(query)
+    cached = cache.get("answer", cache_key)
+    if cached is not None:
+        print(f"⚡ ANSWER CACHE HIT: {query}")
+        return cached
+
+    _answer_sql.statements = []
+    try:
+        answer = answer_question(query)
+    finally:
+        statements, _answer_sql.statements = _answer_sql.statements, None
+    if not answer.startswith(UNCACHEABLE_PREFIXES) and "Error processing:" not in answer:
+        # Tag by the SQL that produced the answer; the question text is only a fallback
+        tags = sorted({tag for sql in statements for tag in cache_tags_for(query, sql)}) or cache_tags_for(query)
+        cache.set("answer", cache_key, answer, ttl=answer_cache_ttl, tags=tags)
+    return answer
+
+
+def answer_question(query: str) -> str:
     try:
         # First check if this is a multi-part query
         if is_multipart_query(query):
@@ -410,17 +713,25 @@ Examples of complete questions:
 • What sizes are available for Van Huesen?
 • How much revenue would we get from selling all shirts?"""        # Print the user query to console for debugging
         print(f"\n🔍 USER QUERY: {query}")
+
+        if sql_only_mode:
+            return answer_two_stage(query)
         
         # Only create and run chain if query is relevant
         chain = SQLDatabaseChain.from_llm(
             llm=llm,
             db=db,
-            prompt=few_shot_prompt,
+            prompt=get_prompt(query),
             return_intermediate_steps=True,
             verbose=False
         )
 
         result = chain.invoke({"query": query})
+        executed_sql = chain_sql(result)
+        if executed_sql:
+            note_sql(executed_sql)
+            # Kept like the two-stage SQL so follow-ups can rewrite it (see remember_question)
+            cache.set("sql", normalize_question(query), executed_sql, ttl=sql_cache_ttl)
         
         if 'result' in result:
             answer = result['result']
@@ -464,6 +775,7 @@ Examples of complete questions:
                         # Execute the SQL query
                         sql_result = db.run(sql_query)
                         print(f"📋 SQL RESULT: {sql_result}")
+                        note_sql(sql_query)
                         
                         # Check for None results (non-existent brands/items) or zero results
                         from decimal import Decimal
@@ -627,6 +939,7 @@ Examples of complete questions:
                 print(f"📊 SQL QUERY: {answer}")
                 sql_result = db.run(answer)
                 print(f"📋 SQL RESULT: {sql_result}")
+                note_sql(answer)
                 # Final fallback: clean the intermediate result and check for None/empty
                 cleaned = str(sql_result).replace("[", "").replace("]", "").replace("(", "").replace(")", "").replace(",", "").replace("'", "").replace("Decimal", "")
                 if cleaned.strip().lower() == "none" or cleaned.strip() == "":
@@ -664,6 +977,7 @@ Examples of complete questions:
                         print(f"📊 SQL QUERY: {answer}")
                         sql_result = db.run(answer)
                         print(f"📋 SQL RESULT: {sql_result}")
+                        note_sql(answer)
                         
                         # Format the result properly based on query type
                         result_str = str(sql_result)
@@ -755,6 +1069,21 @@ Examples of complete questions:
         
         return "⚠️ No result returned."
 
+    except LLMUnavailableError as e:
+        print(f"⚠️ LLM unavailable, using template path: {str(e)}")
+        return answer_without_llm(query)
+
     except Exception as e:
         print(f"❌ Error: {str(e)}")
-        return f"❌ Error: {str(e)}"
\ No newline at end of file
+        return f"❌ Error: {str(e)}"
+
+# -------------------- Cache Warm-up --------------------
+cache_warmer = CacheWarmer(
+    ask_question,
+    cache,
+    llm_bucket,
+    lambda: warmup_questions(query_log, few_shots, warmup_top_n, warmup_include_few_shots),
+    llm_reserve=warmup_llm_reserve,
+)
+if warmup_enabled:
+    change_tracker.add_listener(cache_warmer.on_inventory_change)
@@ -0,0 +1,263 @@
+# llm_client.py
+#
+# Quota-aware wrapper around the Gemini chat model: a token bucket sized to the
+# API quota, jittered exponential retry on transient errors, a per-call
+# deadline and a circuit breaker that fails fast while the API is unhealthy.
+
+import random
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class LLMUnavailableError(Exception):
+    """The LLM could not produce a response: callers should degrade, not report an error"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised instead of calling the LLM while the circuit breaker is open"""
+
+
+class RateLimitTimeout(LLMUnavailableError, TimeoutError):
+    """Raised when no request token becomes available before the call deadline"""
+
+# -------------------- Class: TokenBucket --------------------
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    With a `store` (a SharedCache) the bucket state lives in the shared SQLite
+    file, so all worker processes on the host draw from one quota.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, store=None, name: str = "llm"):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.store = store
+        self.name = name
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _take(self, reserve: float = 0.0, peek: bool = False):
+        """Take a token if 1 + reserve are available; returns (taken, tokens before taking)"""
+        if self.store is not None:
+            return self.store.take_token(self.name, self.rate, self.capacity, reserve=reserve, peek=peek)
+        with self.lock:
+            self._refill()
+            tokens = self.tokens
+            taken = not peek and tokens >= 1 + reserve
+            if taken:
+                self.tokens -= 1
+            return taken, tokens
+
+    def available(self) -> float:
+        return self._take(peek=True)[1]
+
+    def try_acquire(self, reserve: float = 0.0) -> bool:
+        """Take a token without waiting, leaving at least `reserve` tokens behind"""
+        return self._take(reserve)[0]
+
+    def acquire(self, timeout: float):
+        """Block until a token is available or raise RateLimitTimeout after `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            taken, tokens = self._take()
+            if taken:
+                return
+            wait = (1 - tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise RateLimitTimeout("LLM request quota exhausted, no token available before the deadline")
+            time.sleep(wait)
+
+# -------------------- Class: CircuitBreaker --------------------
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive transient failures.
+
+    While open every call fails fast; after `reset_timeout` seconds a single
+    trial call is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self.lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def release_trial(self):
+        """Give back a half-open trial slot that was not used to call the API"""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+# -------------------- Function: Transient Error Detection --------------------
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+TRANSIENT_TYPES = (TimeoutError, ConnectionError)
+if google_exceptions is not None:
+    # 429 quota errors, 5xx overload and gRPC deadlines from the Gemini client
+    TRANSIENT_TYPES += (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.InternalServerError,
+        google_exceptions.BadGateway,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.GatewayTimeout,
+        google_exceptions.DeadlineExceeded,
+    )
+
+# HTTP status at the start of an error message ("429 Resource has been exhausted")
+TRANSIENT_STATUS = re.compile(r"^\s*(429|500|502|503|504)\b")
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True for errors worth retrying: rate limits, overload and timeouts.
+
+    Decided by exception type, following wrapped causes, so a message that
+    merely mentions "500 tokens" or "unavailable" is not retried.
+    """
+    seen = 0
+    while error is not None and seen < 5:
+        if isinstance(error, TRANSIENT_TYPES) or TRANSIENT_STATUS.match(str(error)):
+            return True
+        error = error.__cause__ or error.__context__
+        seen += 1
+    return False
+
+# -------------------- Class: ResilientChatModel --------------------
+class ResilientChatModel(BaseChatModel):
+    """Chat model wrapper adding rate limiting, retries, deadlines and a circuit breaker.
+
+    It is a drop-in replacement for the wrapped model, so SQLDatabaseChain and
+    the two-stage pipeline use it unchanged.
+    """
+
+    inner: BaseChatModel
+    bucket: Any
+    breaker: Any
+    max_retries: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 20.0
+    call_deadline: float = 60.0
+
+    @property
+    def _llm_type(self) -> str:
+        return f"resilient-{self.inner._llm_type}"
+
+    def _backoff(self, attempt: int, deadline: float):
+        # Full jitter: sleep a random amount up to the exponential cap
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            raise LLMUnavailableError("LLM call deadline exceeded while retrying")
+        time.sleep(delay)
+
+    def _before_attempt(self, deadline: float):
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit breaker is open")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # A half-open trial slot we took must not stay claimed
+            self.breaker.release_trial()
+            raise LLMUnavailableError("LLM call deadline exceeded")
+        try:
+            self.bucket.acquire(timeout=remaining)
+        except RateLimitTimeout:
+            # Local quota pressure is not an API failure
+            self.breaker.release_trial()
+            raise
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        deadline = time.monotonic() + self.call_deadline
+        attempt = 0
+        while True:
+            self._before_attempt(deadline)
+            try:
+                message = self.inner.invoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                if not is_transient_error(e):
+                    # The API answered; a bad request says nothing about its health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                print(f"⚠️ LLM transient error (attempt {attempt + 1}): {e}")
+                if attempt >= self.max_retries:
+                    raise LLMUnavailableError(f"LLM unavailable after {attempt + 1} attempts: {e}") from e
+                self._backoff(attempt, deadline)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        deadline = time.monotonic() + self.call_deadline
+        attempt = 0
+        while True:
+            self._before_attempt(deadline)
+            started = False
+            try:
+                for chunk in self.inner.stream(messages, stop=stop, **kwargs):
+                    started = True
+                    yield ChatGenerationChunk(message=AIMessageChunk(content=chunk.content))
+            except GeneratorExit:
+                # Caller stopped reading early; not a failure
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                if not is_transient_error(e):
+                    # The API answered; a bad request says nothing about its health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if started:
+                    # Retrying after output was emitted would duplicate it
+                    raise LLMUnavailableError(f"LLM stream interrupted: {e}") from e
+                print(f"⚠️ LLM transient error (attempt {attempt + 1}): {e}")
+                if attempt >= self.max_retries:
+                    raise LLMUnavailableError(f"LLM unavailable after {attempt + 1} attempts: {e}") from e
+                self._backoff(attempt, deadline)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return
@@ -0,0 +1,153 @@
+# pagination.py
+#
+# Paginated execution of listing questions ("list all discounted items"):
+# rows are streamed from a server-side cursor one page at a time and returned
+# typed, instead of as one big db.run() string.
+
+import hashlib
+import re
+
+from sqlalchemy import text
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# -------------------- Function: Listing Detection --------------------
+# Plural item nouns a listing asks for
+ITEM_NOUNS = r"(items|t-?shirts|tshirts|shirts|products)"
+
+
+def is_listing_query(query: str) -> bool:
+    """True for questions that ask for a set of items rather than a single value or an aggregate.
+
+    "Show me red shirts under ₹500" is a listing; "Show me the discount on Levi
+    shirts" or "Get the colors for Nike" are not, as the plural item noun is
+    not what is being shown.
+    """
+    q = query.lower().strip()
+    if re.search(r"\b(how many|how much|total|count|sum|revenue|value)\b", q):
+        return False
+    listing_patterns = [
+        r'^(list|enumerate)\b',
+        r'\b(list|show me) (all|every)\b',
+        r'\ball (the )?(discounted )?' + ITEM_NOUNS + r'\b',
+        r'^which ' + ITEM_NOUNS + r'\b',
+        # show/display/give me/get/find [me] [all|every|the|any] <up to 4 modifiers> <plural noun>
+        r"^(show|display|give|get|find)( me)?( (all|every|the|any))?"
+        r"( (?!(on|of|for|in|with|from|about|per|to)\b)[\w'₹.-]+){0,4}? " + ITEM_NOUNS + r"\b",
+    ]
+    return any(re.search(pattern, q) for pattern in listing_patterns)
+
+# -------------------- Function: Cursor Tokens --------------------
+def plan_id_for(sql: str) -> str:
+    return hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(plan_id: str, offset: int) -> str:
+    return f"{plan_id}.{offset}"
+
+
+def decode_cursor(cursor: str):
+    """Return (plan_id, offset), raising ValueError for a malformed cursor"""
+    plan_id, _, offset = cursor.partition(".")
+    if not re.fullmatch(r"[0-9a-f]{16}", plan_id) or not offset.isdigit():
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return plan_id, int(offset)
+
+# -------------------- Function: Row Limits --------------------
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+    'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'fifteen': 15, 'twenty': 20,
+}
+
+
+def split_limit(sql: str):
+    """Split a trailing LIMIT clause off a query.
+
+    Returns (sql, count, skip): count is None when there is no LIMIT, skip is
+    the OFFSET it carried (0 if none).
+    """
+    sql = sql.strip().rstrip(";").strip()
+    match = re.search(r"\s+LIMIT\s+(\d+)(?:\s*(,|OFFSET)\s*(\d+))?\s*$", sql, re.IGNORECASE)
+    if not match:
+        return sql, None, 0
+    if match.group(2) == ",":
+        # MySQL's "LIMIT skip, count"
+        return sql[:match.start()], int(match.group(3)), int(match.group(1))
+    return sql[:match.start()], int(match.group(1)), int(match.group(3) or 0)
+
+
+# LIMIT the prompt asks the LLM to add when the question does not say how many rows
+PROMPT_TOP_K = 5
+
+SUPERLATIVE_PATTERN = re.compile(
+    r"\b(most|least|fewest|highest|lowest|cheapest|costliest|priciest|largest|smallest|biggest|"
+    r"newest|latest|oldest|best|worst|top|max|maximum|min|minimum)\b"
+)
+
+
+def row_cap(query: str, sql: str):
+    """Total rows to page through: the query's LIMIT if it is meaningful, else None.
+
+    The prompt tells the LLM to add LIMIT top_k by default; only that one is
+    replaced by pagination. Any other count is kept, as is a top_k LIMIT that
+    the question asks for ("the 5 cheapest shirts", "top five"), one that
+    picks a superlative ("the most expensive shirts") or one with an OFFSET.
+    """
+    _, count, skip = split_limit(sql)
+    if count is None:
+        return None
+    q = query.lower()
+    asked = {int(n) for n in re.findall(r"\b\d+\b", q)}
+    asked.update(value for word, value in NUMBER_WORDS.items() if re.search(r"\b" + word + r"\b", q))
+    if count != PROMPT_TOP_K or count in asked or skip or SUPERLATIVE_PATTERN.search(q):
+        return count
+    return None
+
+
+def _has_top_level_order_by(sql: str) -> bool:
+    # Drop parenthesised subqueries first; their ORDER BY does not order the result
+    previous = None
+    while previous != sql:
+        previous, sql = sql, re.sub(r"\([^()]*\)", "", sql)
+    return re.search(r"\bORDER\s+BY\b", sql, re.IGNORECASE) is not None
+
+# -------------------- Function: Fetch Page --------------------
+def fetch_page(db, sql: str, offset: int, page_size: int, max_rows: int = None, batch_size: int = 50):
+    """Fetch one page of a query's rows using a server-side cursor.
+
+    Returns (columns, rows, has_more). One extra row is requested to know
+    whether another page exists without counting the whole result. The
+    query's own LIMIT is replaced by the page window; max_rows (see row_cap)
+    stops paging at the number of rows the user asked for.
+    """
+    if max_rows is not None:
+        page_size = min(page_size, max_rows - offset)
+        if page_size <= 0:
+            return [], [], False
+
+    base_sql, _, skip = split_limit(sql)
+    rows = []
+    with db._engine.connect() as connection:
+        # OFFSET pages are only stable under a total order: order by every output
+        # column (id columns first) after any ORDER BY the query already has
+        probe = connection.execute(text(f"{base_sql} LIMIT 0"))
+        probe_columns = list(probe.keys())
+        probe.close()
+        positions = sorted(range(1, len(probe_columns) + 1), key=lambda i: not probe_columns[i - 1].endswith("_id"))
+        tiebreak = ", ".join(str(i) for i in positions)
+        ordered_sql = f"{base_sql}, {tiebreak}" if _has_top_level_order_by(base_sql) else f"{base_sql} ORDER BY {tiebreak}"
+
+        # Appended rather than wrapped in a derived table: MySQL may drop a derived
+        # table's ORDER BY, and SELECT * over a join can repeat column names
+        paged_sql = f"{ordered_sql} LIMIT {page_size + 1} OFFSET {skip + offset}"
+        result = connection.execution_options(stream_results=True).execute(text(paged_sql))
+        columns = list(result.keys())
+        while len(rows) <= page_size:
+            batch = result.fetchmany(min(batch_size, page_size + 1 - len(rows)))
+            if not batch:
+                break
+            rows.extend(tuple(row) for row in batch)
+        result.close()
+    has_more = len(rows) > page_size and (max_rows is None or offset + page_size < max_rows)
+    return columns, rows[:page_size], has_more
@@ -0,0 +1,114 @@
+# profiling.py
+#
+# Opt-in per-request profiling: a CPU profile (cProfile, or pyinstrument when
+# installed and selected) plus a tracemalloc snapshot diff, stored in the
+# shared cache so any worker can serve it from the debug endpoint.
+
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+
+class RequestProfiler:
+    """Profile single calls and keep their reports for later retrieval.
+
+    cProfile only sees the calling thread, so work handed to other threads
+    shows up as waiting time. tracemalloc is
+    process-wide, so only one request is memory-profiled at a time and its
+    diff can include allocations made concurrently by other requests.
+    """
+
+    def __init__(self, cache, sample_rate: float = 0.0, backend: str = "cprofile",
+                 ttl: float = 3600, top_n: int = 30):
+        self.cache = cache
+        self.sample_rate = sample_rate
+        self.backend = backend
+        self.ttl = ttl
+        self.top_n = top_n
+        self.memory_lock = threading.Lock()
+
+    def should_profile(self, requested: bool) -> bool:
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def _cpu_profiler(self):
+        if self.backend == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("⚠️ pyinstrument is not installed, falling back to cProfile")
+            else:
+                profiler = Profiler()
+                return "pyinstrument", profiler.start, profiler.stop, lambda: profiler.output_text(unicode=True)
+
+        profiler = cProfile.Profile()
+
+        def report():
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(self.top_n)
+            return out.getvalue()
+        return "cprofile", profiler.enable, profiler.disable, report
+
+    def run(self, label: str, fn, *args):
+        """Call fn(*args) under the profilers; returns (result, profile_id).
+
+        If neither profiler can start (e.g. Python 3.12+ refusing a second
+        concurrent cProfile), fn still runs and profile_id is None.
+        """
+        cpu_backend, start_cpu, stop_cpu, cpu_report = self._cpu_profiler()
+        trace_memory = self.memory_lock.acquire(blocking=False)
+        if trace_memory and tracemalloc.is_tracing():
+            # Someone else (e.g. PYTHONTRACEMALLOC) owns tracemalloc; leave it alone
+            self.memory_lock.release()
+            trace_memory = False
+
+        cpu_running = False
+        before = memory = None
+        started = time.perf_counter()
+        try:
+            if trace_memory:
+                tracemalloc.start()
+                before = tracemalloc.take_snapshot()
+            try:
+                start_cpu()
+                cpu_running = True
+            except Exception as e:
+                print(f"⚠️ CPU profiler unavailable, running without it: {str(e)}")
+            result = fn(*args)
+        finally:
+            if cpu_running:
+                stop_cpu()
+            wall_ms = (time.perf_counter() - started) * 1000
+            if trace_memory:
+                if before is not None:
+                    after = tracemalloc.take_snapshot()
+                    _, peak = tracemalloc.get_traced_memory()
+                    memory = {
+                        "peak_kb": round(peak / 1024, 1),
+                        "top_allocations": [str(stat) for stat in after.compare_to(before, "lineno")[:self.top_n]],
+                    }
+                tracemalloc.stop()
+                self.memory_lock.release()
+
+        if not cpu_running and memory is None:
+            return result, None
+
+        profile_id = uuid.uuid4().hex[:12]
+        self.cache.set("profile", profile_id, {
+            "id": profile_id,
+            "label": label,
+            "created_at": time.time(),
+            "wall_ms": round(wall_ms, 1),
+            "cpu_backend": cpu_backend if cpu_running else None,
+            "cpu_profile": cpu_report() if cpu_running else "skipped: another profiler was active",
+            "memory": memory or "skipped: another request was being memory-profiled",
+        }, ttl=self.ttl)
+        print(f"🔬 PROFILE {profile_id}: {label} ({wall_ms:.0f} ms)")
+        return result, profile_id
+
+    def get(self, profile_id: str):
+        return self.cache.get("profile", profile_id)
@@ -0,0 +1,192 @@
+# prompt_budget.py
+#
+# Helpers for keeping the text-to-SQL prompt small: a question-aware compact
+# schema, few-shot examples trimmed to what the model needs, and an adaptive
+# number of examples picked by similarity score.
+
+import re
+from functools import lru_cache
+
+import tiktoken
+from langchain.prompts import FewShotPromptTemplate, PromptTemplate
+
+from sql_utils import fetch_rows
+
+# -------------------- Token Counting --------------------
+@lru_cache(maxsize=1)
+def _encoding():
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count of a prompt using tiktoken's cl100k_base encoding"""
+    return len(_encoding().encode(text))
+
+# -------------------- Compact Prompt Templates --------------------
+compact_mysql_prompt = """You are a MySQL expert for a t-shirt inventory. Write one MySQL query for the question.
+- LIMIT to {top_k} rows unless asked otherwise
+- Select only needed columns, wrap column names in backticks (`)
+- Use only the tables and columns listed below
+
+"""
+
+compact_sql_only_suffix = """Tables:
+{table_info}
+
+Question: {input}
+SQLQuery: """
+
+compact_answer_suffix = """Tables:
+{table_info}
+
+Then answer conversationally from the SQLResult, with units (e.g. "₹1,200").
+Format: Question / SQLQuery / SQLResult / Answer
+
+Question: {input}
+SQLQuery: """
+
+sql_only_example_prompt = PromptTemplate(
+    input_variables=["Question", "SQLQuery"],
+    template="""
+Question: {Question}
+SQLQuery: {SQLQuery}
+""",
+)
+
+full_example_prompt = PromptTemplate(
+    input_variables=["Question", "SQLQuery", "SQLResult", "Answer"],
+    template="""
+Question: {Question}
+SQLQuery: {SQLQuery}
+SQLResult: {SQLResult}
+Answer: {Answer}
+""",
+)
+
+# -------------------- Column Relevance --------------------
+# Keywords that make a column worth sending to the LLM. Columns not listed here
+# are always kept, as are primary and foreign keys.
+COLUMN_HINTS = {
+    'brand': ['brand', 'brands', 'nike', 'adidas', 'levi', 'levis', "levi's", 'van huesen'],
+    'color': ['color', 'colors', 'colour', 'colours', 'red', 'blue', 'black', 'white'],
+    'size': ['size', 'sizes', 'xs', 's', 'm', 'l', 'xl', 'small', 'medium', 'large', 'extra large'],
+    'price': ['price', 'prices', 'priced', 'cost', 'costs', 'revenue', 'value', 'worth', 'sell', 'selling',
+              'save', 'discounted', 'cheap', 'cheaper', 'cheapest', 'expensive', 'costly', 'affordable',
+              'budget', 'under', 'over', 'below', 'above', 'less than', 'more than', 'between', 'rupees',
+              'rs', 'inr', 'highest', 'lowest', 'max', 'min', 'maximum', 'minimum'],
+    'stock_quantity': ['how many', 'stock', 'quantity', 'count', 'left', 'have', 'total', 'inventory',
+                       'revenue', 'value', 'worth', 'cost', 'sell', 'selling', 'save', 'most'],
+    'pct_discount': ['discount', 'discounts', 'discounted', 'offer', 'offers'],
+}
+
+# Any amount ("under ₹500", "below 1000") needs the price column whatever the wording
+AMOUNT_PATTERN = re.compile(r"[₹$]|\d")
+
+# Maximum number of distinct values listed inline for low-cardinality columns
+MAX_INLINE_VALUES = 10
+
+_column_values_cache = {}
+
+
+def clear_inline_values(changes: dict = None):
+    """Forget cached value lists, for the changed tables only when `changes` is given.
+
+    Registered as a ChangeTracker listener so a new brand or colour reaches the prompt.
+    """
+    for key in list(_column_values_cache):
+        if changes is None or key[0] in changes:
+            _column_values_cache.pop(key, None)
+
+
+def _mentions(question: str, keywords: list) -> bool:
+    q = question.lower()
+    return any(re.search(r"(?<![\w'])" + re.escape(kw) + r"(?![\w'])", q) for kw in keywords)
+
+
+def relevant_columns(table, question: str) -> list:
+    """Return the columns of a SQLAlchemy table that the question could need"""
+    columns = []
+    for column in table.columns:
+        is_key = column.primary_key or column.foreign_keys or column.name.endswith('_id')
+        hints = COLUMN_HINTS.get(column.name)
+        if column.name == 'price' and AMOUNT_PATTERN.search(question):
+            columns.append(column)
+        elif is_key or hints is None or _mentions(question, hints):
+            columns.append(column)
+    return columns
+
+
+def _inline_values(db, table, column) -> list:
+    """Distinct values of a low-cardinality text column, fetched once per process"""
+    cache_key = (table.name, column.name)
+    if cache_key not in _column_values_cache:
+        values = []
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = None
+        if python_type is str:
+            _, rows = fetch_rows(
+                db, f"SELECT DISTINCT `{column.name}` FROM `{table.name}` LIMIT {MAX_INLINE_VALUES + 1}"
+            )
+            if len(rows) <= MAX_INLINE_VALUES:
+                values = [row[0] for row in rows if row[0] is not None]
+        _column_values_cache[cache_key] = values
+    return _column_values_cache[cache_key]
+
+
+def compact_table_info(db, question: str) -> str:
+    """Render a one-line-per-table schema holding only the columns the question needs.
+
+    Sample rows are dropped; instead, short value lists are appended for
+    categorical columns so the model still spells brands and sizes correctly.
+    """
+    usable = set(db.get_usable_table_names())
+    lines = []
+    for table in db._metadata.sorted_tables:
+        if table.name not in usable:
+            continue
+        columns = relevant_columns(table, question)
+        non_key = [c for c in columns if not (c.primary_key or c.foreign_keys or c.name.endswith('_id'))]
+        # Skip side tables (e.g. discounts) when none of their data columns is relevant
+        if not non_key and table.name != 't_shirts':
+            continue
+        rendered = []
+        for column in columns:
+            text = f"{column.name} {column.type}"
+            values = _inline_values(db, table, column) if column in non_key else []
+            if values:
+                text += " {" + "|".join(str(v) for v in values) + "}"
+            rendered.append(text)
+        lines.append(f"{table.name}(" + ", ".join(rendered) + ")")
+    return "\n".join(lines)
+
+# -------------------- Adaptive Few-Shot Selection --------------------
+def select_examples(vectorstore, question: str, min_k: int = 1, max_k: int = 3,
+                    min_score: float = 0.5) -> list:
+    """Pick between min_k and max_k few-shot examples, keeping only close matches"""
+    scored = vectorstore.similarity_search_with_relevance_scores(question, k=max_k)
+    examples = [doc.metadata for doc, score in scored if score >= min_score]
+    if len(examples) < min_k:
+        examples = [doc.metadata for doc, _ in scored[:min_k]]
+    return examples
+
+
+def build_compact_prompt(db, vectorstore, question: str, sql_only: bool = False,
+                         min_k: int = 1, max_k: int = 3, min_score: float = 0.5) -> FewShotPromptTemplate:
+    """Build a FewShotPromptTemplate with a compact schema and adaptively chosen examples.
+
+    When sql_only is set the examples carry only Question/SQLQuery pairs, since
+    the SQLResult and Answer lines are never needed to write the query itself.
+    """
+    examples = select_examples(vectorstore, question, min_k=min_k, max_k=max_k, min_score=min_score)
+    if sql_only:
+        examples = [{'Question': e['Question'], 'SQLQuery': e['SQLQuery']} for e in examples]
+    return FewShotPromptTemplate(
+        examples=examples,
+        example_prompt=sql_only_example_prompt if sql_only else full_example_prompt,
+        prefix=compact_mysql_prompt,
+        suffix=compact_sql_only_suffix if sql_only else compact_answer_suffix,
+        input_variables=["input", "top_k"],
+        partial_variables={"table_info": compact_table_info(db, question)},
+    )
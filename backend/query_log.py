@@ -0,0 +1,180 @@
+# query_log.py
+#
+# Persisted log of asked questions with an in-memory prefix trie and trigram
+# index for fast autocomplete. Suggestions are ranked by how often and how
+# recently a question was asked; the same ranking feeds cache pre-warming.
+
+import os
+import sqlite3
+import threading
+import time
+
+from singleflight import normalize_question
+
+# -------------------- Class: QueryLog --------------------
+class QueryLog:
+    """Question frequency/recency log stored in SQLite (shared by all workers)"""
+
+    def __init__(self, path: str, half_life_days: float = 7.0):
+        self.path = path
+        self.half_life = half_life_days * 86400
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS queries (
+                   key TEXT PRIMARY KEY,
+                   question TEXT NOT NULL,
+                   count INTEGER NOT NULL,
+                   last_seen REAL NOT NULL
+               )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS queries_by_last_seen ON queries (last_seen)")
+        # Single-row write counter, bumped by triggers in the same transaction as each write
+        conn.execute("CREATE TABLE IF NOT EXISTS log_version (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO log_version (id, version) VALUES (0, 0)")
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS queries_{event.lower()}_version AFTER {event} ON queries
+                    BEGIN UPDATE log_version SET version = version + 1 WHERE id = 0; END"""
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def record(self, question: str):
+        key = normalize_question(question)
+        if not key:
+            return
+        self._connection().execute(
+            """INSERT INTO queries (key, question, count, last_seen) VALUES (?, ?, 1, ?)
+               ON CONFLICT(key) DO UPDATE SET question = excluded.question,
+                   count = count + 1, last_seen = excluded.last_seen""",
+            (key, question.strip(), time.time()),
+        )
+
+    def version(self) -> int:
+        """Changes whenever anything is recorded, by this process or another one"""
+        # Stored in the database, so values read on any connection are comparable
+        return self._connection().execute("SELECT version FROM log_version WHERE id = 0").fetchone()[0]
+
+    def entries(self, since: float = None) -> list:
+        """All logged questions, or only those asked at or after `since`"""
+        if since is None:
+            return self._connection().execute("SELECT key, question, count, last_seen FROM queries").fetchall()
+        return self._connection().execute(
+            "SELECT key, question, count, last_seen FROM queries WHERE last_seen >= ?", (since,)
+        ).fetchall()
+
+    def score(self, count: int, last_seen: float, now: float = None) -> float:
+        """Frequency decayed by age: a question's weight halves every half-life"""
+        age = (now or time.time()) - last_seen
+        return count * 0.5 ** (age / self.half_life)
+
+    def top_questions(self, limit: int = 20) -> list:
+        now = time.time()
+        ranked = sorted(self.entries(), key=lambda e: self.score(e[2], e[3], now), reverse=True)
+        return [question for _, question, _, _ in ranked[:limit]]
+
+# -------------------- Class: SuggestionIndex --------------------
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestionIndex:
+    """Prefix trie plus trigram index over the query log.
+
+    The index is updated incrementally: when the log's version shows that
+    some process has written to it, only rows asked since the last update
+    are read, and only keys not seen before are added to the trie.
+    """
+
+    MAX_PREFIX_CANDIDATES = 500
+    # Trie paths stop at this depth; longer prefixes are checked against the keys
+    MAX_TRIE_DEPTH = 24
+    # Writers in other processes can commit slightly out of timestamp order
+    CLOCK_MARGIN = 10.0
+
+    def __init__(self, log: QueryLog):
+        self.log = log
+        self.lock = threading.Lock()
+        self.version = None
+        self.watermark = None
+        self.entries = {}
+        self.trie = {}
+        self.trigram_index = {}
+
+    def _index(self, key: str):
+        # Index the whole question and every word start, so "nike" finds "how many nike shirts"
+        words = key.split(" ")
+        for i in range(len(words)):
+            node = self.trie
+            for char in " ".join(words[i:])[:self.MAX_TRIE_DEPTH]:
+                node = node.setdefault(char, {})
+                node.setdefault("$", set()).add(key)
+        for gram in _trigrams(key):
+            self.trigram_index.setdefault(gram, set()).add(key)
+
+    def _refresh(self):
+        version = self.log.version()
+        if version == self.version:
+            return
+        since = None if self.watermark is None else self.watermark - self.CLOCK_MARGIN
+        for key, question, count, last_seen in self.log.entries(since=since):
+            if key not in self.entries:
+                self._index(key)
+            self.entries[key] = (question, count, last_seen)
+            self.watermark = last_seen if self.watermark is None else max(self.watermark, last_seen)
+        self.version = version
+
+    def refresh(self):
+        """Bring the index up to date; call at startup so the first /suggest skips the full build"""
+        with self.lock:
+            self._refresh()
+
+    def _prefix_matches(self, prefix: str) -> set:
+        node = self.trie
+        for char in prefix[:self.MAX_TRIE_DEPTH]:
+            node = node.get(char)
+            if node is None:
+                return set()
+        keys = node.get("$", set())
+        if len(prefix) > self.MAX_TRIE_DEPTH:
+            keys = {key for key in keys if f" {prefix}" in f" {key}"}
+        return keys
+
+    def _fuzzy_matches(self, text: str, min_similarity: float = 0.3) -> dict:
+        grams = _trigrams(text)
+        overlap = {}
+        for gram in grams:
+            for key in self.trigram_index.get(gram, ()):
+                overlap[key] = overlap.get(key, 0) + 1
+        return {key: hits / len(grams) for key, hits in overlap.items() if hits / len(grams) >= min_similarity}
+
+    def suggest(self, text: str, limit: int = 5) -> list:
+        """Suggestions for partially typed text: prefix matches first, then fuzzy ones"""
+        now = time.time()
+        with self.lock:
+            self._refresh()
+            prefix = normalize_question(text) if text.strip() else ""
+
+            def ranked(keys):
+                return sorted(keys, key=lambda k: self.log.score(self.entries[k][1], self.entries[k][2], now),
+                              reverse=True)
+
+            if not prefix:
+                keys = ranked(self.entries)[:limit]
+            else:
+                keys = ranked(list(self._prefix_matches(prefix))[:self.MAX_PREFIX_CANDIDATES])[:limit]
+                if len(keys) < limit:
+                    fuzzy = self._fuzzy_matches(prefix)
+                    extra = sorted((k for k in fuzzy if k not in keys), key=lambda k: fuzzy[k], reverse=True)
+                    keys += extra[:limit - len(keys)]
+
+            return [{"question": self.entries[k][0], "count": self.entries[k][1]} for k in keys]
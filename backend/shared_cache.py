@@ -0,0 +1,181 @@
+# shared_cache.py
+#
+# A small key/value cache stored in a local SQLite file so every worker
+# process on the host shares the same answer and SQL caches.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SharedCache:
+    """Namespaced JSON cache with per-entry TTL, backed by SQLite in WAL mode.
+
+    Connections are opened lazily per process and thread, so an instance
+    created before the server forks its workers is safe to use in each of them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache (
+                   namespace TEXT NOT NULL,
+                   key TEXT NOT NULL,
+                   value TEXT NOT NULL,
+                   expires_at REAL,
+                   PRIMARY KEY (namespace, key)
+               )"""
+        )
+        # Tags let callers invalidate groups of entries (e.g. every answer about one brand)
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache_tags (
+                   namespace TEXT NOT NULL,
+                   key TEXT NOT NULL,
+                   tag TEXT NOT NULL,
+                   PRIMARY KEY (namespace, key, tag)
+               )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_tags_by_tag ON cache_tags (tag)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def get(self, namespace: str, key: str):
+        """Return the cached value, or None if missing or expired"""
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(namespace, key)
+            return None
+        return json.loads(value)
+
+    def set(self, namespace: str, key: str, value, ttl: float = None, tags: list = None):
+        expires_at = time.time() + ttl if ttl else None
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at),
+            )
+            conn.execute("DELETE FROM cache_tags WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.executemany(
+                "INSERT OR IGNORE INTO cache_tags (namespace, key, tag) VALUES (?, ?, ?)",
+                [(namespace, key, tag) for tag in tags or []],
+            )
+
+    def delete(self, namespace: str, key: str):
+        conn = self._connection()
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+        conn.execute("DELETE FROM cache_tags WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: str = None):
+        conn = self._connection()
+        if namespace is None:
+            conn.execute("DELETE FROM cache")
+            conn.execute("DELETE FROM cache_tags")
+        else:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+            conn.execute("DELETE FROM cache_tags WHERE namespace = ?", (namespace,))
+
+    def invalidate_tags(self, tags: list) -> int:
+        """Delete every entry carrying any of the given tags; returns the number removed"""
+        if not tags:
+            return 0
+        placeholders = ", ".join("?" for _ in tags)
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                f"""DELETE FROM cache WHERE (namespace, key) IN (
+                        SELECT namespace, key FROM cache_tags WHERE tag IN ({placeholders}))""",
+                list(tags),
+            )
+            conn.execute(f"""DELETE FROM cache_tags WHERE (namespace, key) IN (
+                                 SELECT namespace, key FROM cache_tags WHERE tag IN ({placeholders}))""",
+                         list(tags))
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        conn = self._connection()
+        cursor = conn.execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+        conn.execute(
+            "DELETE FROM cache_tags WHERE (namespace, key) NOT IN (SELECT namespace, key FROM cache)"
+        )
+        return cursor.rowcount
+
+    def get_meta(self, key: str, default=None):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    def take_token(self, name: str, rate: float, capacity: float, reserve: float = 0.0, peek: bool = False):
+        """Token bucket shared by every process using this file.
+
+        Refills at `rate` tokens per second up to `capacity`, then takes one
+        token if at least 1 + reserve are available (never when peek is set).
+        Returns (taken, tokens) with the token count before taking.
+        """
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (f"bucket:{name}",)).fetchone()
+            state = json.loads(row[0]) if row else {"tokens": capacity, "updated": now}
+            tokens = min(capacity, state["tokens"] + max(0.0, now - state["updated"]) * rate)
+            taken = not peek and tokens >= 1 + reserve
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (f"bucket:{name}", json.dumps({"tokens": tokens - 1 if taken else tokens, "updated": now})),
+            )
+        return taken, tokens
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take (or renew) a named lease so only one process runs a background job at a time"""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (f"lease:{name}",)).fetchone()
+            if row:
+                lease = json.loads(row[0])
+                if lease["owner"] != owner and lease["expires_at"] > now:
+                    return False
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (f"lease:{name}", json.dumps({"owner": owner, "expires_at": now + ttl})),
+            )
+        return True
+
+    def release_lease(self, name: str, owner: str):
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (f"lease:{name}",)).fetchone()
+            if row and json.loads(row[0])["owner"] == owner:
+                conn.execute("DELETE FROM meta WHERE key = ?", (f"lease:{name}",))
@@ -0,0 +1,42 @@
+# singleflight.py
+#
+# Request coalescing: concurrent calls for the same key share one in-flight
+# execution instead of each hitting the LLM and the database.
+
+import asyncio
+import re
+
+from starlette.concurrency import run_in_threadpool
+
+# -------------------- Function: Question Normalisation --------------------
+def normalize_question(query: str) -> str:
+    """Canonical form used to decide whether two questions are identical"""
+    q = re.sub(r"\s+", " ", query.strip().lower())
+    return q.rstrip("?.! ")
+
+# -------------------- Class: SingleFlight --------------------
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers await the same result.
+
+    The blocking function runs in Starlette's threadpool so the event loop stays
+    free to accept (and coalesce) further requests while it executes.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key: str, fn, *args):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shield so one disconnecting client does not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def inflight_count(self) -> int:
+        return len(self._inflight)
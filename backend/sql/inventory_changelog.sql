@@ -0,0 +1,68 @@
+-- inventory_changelog.sql
+--
+-- Trigger-maintained changelog read by change_tracker.py to invalidate only
+-- the cached answers affected by a stock, price or discount update.
+--
+--   mysql -u root -p tshirts_db < backend/sql/inventory_changelog.sql
+--
+-- Without this table the tracker falls back to CHECKSUM TABLE polling, which
+-- can only tell that a table changed, not which brands.
+
+CREATE TABLE IF NOT EXISTS inventory_changelog (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL,
+    t_shirt_id INT NULL,
+    brand VARCHAR(100) NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+DROP TRIGGER IF EXISTS t_shirts_after_insert;
+DROP TRIGGER IF EXISTS t_shirts_after_update;
+DROP TRIGGER IF EXISTS t_shirts_after_delete;
+DROP TRIGGER IF EXISTS discounts_after_insert;
+DROP TRIGGER IF EXISTS discounts_after_update;
+DROP TRIGGER IF EXISTS discounts_after_delete;
+
+DELIMITER //
+
+CREATE TRIGGER t_shirts_after_insert AFTER INSERT ON t_shirts FOR EACH ROW
+BEGIN
+    INSERT INTO inventory_changelog (table_name, t_shirt_id, brand) VALUES ('t_shirts', NEW.t_shirt_id, NEW.brand);
+END//
+
+CREATE TRIGGER t_shirts_after_update AFTER UPDATE ON t_shirts FOR EACH ROW
+BEGIN
+    INSERT INTO inventory_changelog (table_name, t_shirt_id, brand) VALUES ('t_shirts', NEW.t_shirt_id, NEW.brand);
+    IF NOT (OLD.brand <=> NEW.brand) THEN
+        INSERT INTO inventory_changelog (table_name, t_shirt_id, brand) VALUES ('t_shirts', OLD.t_shirt_id, OLD.brand);
+    END IF;
+END//
+
+CREATE TRIGGER t_shirts_after_delete AFTER DELETE ON t_shirts FOR EACH ROW
+BEGIN
+    INSERT INTO inventory_changelog (table_name, t_shirt_id, brand) VALUES ('t_shirts', OLD.t_shirt_id, OLD.brand);
+END//
+
+CREATE TRIGGER discounts_after_insert AFTER INSERT ON discounts FOR EACH ROW
+BEGIN
+    INSERT INTO inventory_changelog (table_name, t_shirt_id, brand)
+    SELECT 'discounts', NEW.t_shirt_id, (SELECT brand FROM t_shirts WHERE t_shirt_id = NEW.t_shirt_id);
+END//
+
+CREATE TRIGGER discounts_after_update AFTER UPDATE ON discounts FOR EACH ROW
+BEGIN
+    INSERT INTO inventory_changelog (table_name, t_shirt_id, brand)
+    SELECT 'discounts', NEW.t_shirt_id, (SELECT brand FROM t_shirts WHERE t_shirt_id = NEW.t_shirt_id);
+    IF NOT (OLD.t_shirt_id <=> NEW.t_shirt_id) THEN
+        INSERT INTO inventory_changelog (table_name, t_shirt_id, brand)
+        SELECT 'discounts', OLD.t_shirt_id, (SELECT brand FROM t_shirts WHERE t_shirt_id = OLD.t_shirt_id);
+    END IF;
+END//
+
+CREATE TRIGGER discounts_after_delete AFTER DELETE ON discounts FOR EACH ROW
+BEGIN
+    INSERT INTO inventory_changelog (table_name, t_shirt_id, brand)
+    SELECT 'discounts', OLD.t_shirt_id, (SELECT brand FROM t_shirts WHERE t_shirt_id = OLD.t_shirt_id);
+END//
+
+DELIMITER ;
@@ -0,0 +1,39 @@
+# sql_utils.py
+#
+# Small helpers for getting SQL out of LLM output and typed rows out of MySQL.
+
+import re
+
+from sqlalchemy import text
+
+# -------------------- Function: Extract SQL From LLM Output --------------------
+def extract_sql(output: str) -> str:
+    """Pull the SQL statement out of an LLM completion.
+
+    Handles a leading "SQLQuery:" label, markdown code fences and anything the
+    model emitted after the statement (SQLResult:/Answer: lines).
+    """
+    sql = output.strip()
+    if "SQLQuery:" in sql:
+        sql = sql.split("SQLQuery:", 1)[1]
+    sql = re.split(r"\n\s*(?:SQLResult|Answer|Question):", sql)[0]
+    sql = re.sub(r"^```(?:sql)?|```$", "", sql.strip(), flags=re.IGNORECASE).strip()
+    return sql.rstrip(";").strip()
+
+
+def is_select(sql: str) -> bool:
+    """True if the statement is a read-only SELECT (or CTE) query"""
+    return sql.lstrip("( \n").upper().startswith(("SELECT", "WITH"))
+
+# -------------------- Function: Fetch Typed Rows --------------------
+def fetch_rows(db, sql: str):
+    """Run a query on the SQLDatabase's engine and return (columns, rows) as Python values.
+
+    Unlike db.run(), which returns the stringified result, rows keep their
+    native types (int, Decimal, str) so callers do not need to regex-parse them.
+    """
+    with db._engine.connect() as connection:
+        result = connection.execute(text(sql))
+        columns = list(result.keys())
+        rows = [tuple(row) for row in result.fetchall()]
+    return columns, rows
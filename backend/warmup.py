@@ -0,0 +1,122 @@
+# warmup.py
+#
+# Background cache pre-warming. Replays the most popular questions from the
+# query log plus the few-shot corpus through the normal pipeline, so the
+# answer and SQL caches are hot after a deploy or an inventory change.
+
+import os
+import threading
+import time
+import uuid
+
+from singleflight import normalize_question
+
+# -------------------- Class: CacheWarmer --------------------
+class CacheWarmer:
+    """Low-priority replay of popular questions into the caches.
+
+    Only runs an LLM-backed question while the shared token bucket holds more
+    than `llm_reserve` tokens, so live traffic always keeps quota in hand.
+    A lease in the shared cache makes sure only one worker warms at a time.
+    """
+
+    def __init__(self, answer_fn, cache, bucket, questions_fn, llm_reserve: float = 2.0,
+                 poll_seconds: float = 2.0, lease_seconds: float = 300.0):
+        self.answer_fn = answer_fn
+        self.cache = cache
+        self.bucket = bucket
+        self.questions_fn = questions_fn
+        self.llm_reserve = llm_reserve
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self._owner = None
+        self._owner_pid = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.rerun = False
+        self.stopped = threading.Event()
+
+    @property
+    def owner(self) -> str:
+        """Lease owner id, unique per process.
+
+        Built lazily: with gunicorn's preload_app the warmer is created in the
+        master and forked, and workers sharing one id would all get the lease.
+        """
+        if self._owner_pid != os.getpid():
+            self._owner, self._owner_pid = f"{os.getpid()}-{uuid.uuid4().hex}", os.getpid()
+        return self._owner
+
+    def schedule(self, reason: str):
+        """Start a warm-up pass in the background (or queue one if a pass is running)"""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                self.rerun = True
+                return
+            self.thread = threading.Thread(target=self._run, args=(reason,), name="cache-warmer", daemon=True)
+            self.thread.start()
+
+    def on_inventory_change(self, changes: dict):
+        # Invalidated answers are recomputed; still-cached ones are skipped
+        self.schedule(f"inventory change in {', '.join(sorted(changes))}")
+
+    def stop(self):
+        self.stopped.set()
+
+    def _wait_for_quota(self) -> bool:
+        while self.bucket.available() < 1 + self.llm_reserve:
+            if self.stopped.wait(self.poll_seconds):
+                return False
+        return True
+
+    def _run(self, reason: str):
+        while True:
+            if not self.cache.acquire_lease("warmup", self.owner, self.lease_seconds):
+                print(f"🔥 CACHE WARM-UP ({reason}): another worker is warming, skipping")
+                return
+            try:
+                self.warm(reason)
+            finally:
+                self.cache.release_lease("warmup", self.owner)
+            with self.lock:
+                if not self.rerun or self.stopped.is_set():
+                    self.thread = None
+                    return
+                self.rerun = False
+                reason = "queued re-run"
+
+    def warm(self, reason: str) -> int:
+        """Run one warm-up pass; returns the number of answers computed"""
+        started = time.time()
+        warmed = 0
+        for question in self.questions_fn():
+            if self.stopped.is_set():
+                break
+            if self.cache.get("answer", normalize_question(question)) is not None:
+                continue
+            if not self._wait_for_quota():
+                break
+            # Keep the lease alive for long passes; stop if another worker took it over
+            if not self.cache.acquire_lease("warmup", self.owner, self.lease_seconds):
+                break
+            try:
+                self.answer_fn(question)
+                warmed += 1
+            except Exception as e:
+                print(f"❌ Warm-up failed for '{question}': {str(e)}")
+        print(f"🔥 CACHE WARM-UP ({reason}): {warmed} answers in {time.time() - started:.1f}s")
+        return warmed
+
+
+def warmup_questions(query_log, few_shots, top_n: int, include_few_shots: bool = True) -> list:
+    """Top questions from the log followed by the few-shot corpus, without duplicates"""
+    questions = query_log.top_questions(top_n)
+    if include_few_shots:
+        questions += [example['Question'] for example in few_shots]
+    seen, unique = set(), []
+    for question in questions:
+        key = normalize_question(question)
+        if key not in seen:
+            seen.add(key)
+            unique.append(question)
+    return unique
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import './App.css';
 import TQueryLogo from './logo.png';
 
@@ -10,6 +10,45 @@ function App() {
   const [history, setHistory] = useState([]);
   const [showSuggestions, setShowSuggestions] = useState(false);
   const [filteredHistory, setFilteredHistory] = useState([]);
+  const [columns, setColumns] = useState([]);
+  const [rows, setRows] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [sessionId, setSessionId] = useState(null);
+  const suggestTimer = useRef(null);
+
+  const fetchSuggestions = (text) => {
+    // Debounce keystrokes; suggestions come from the server-side query log
+    clearTimeout(suggestTimer.current);
+    suggestTimer.current = setTimeout(async () => {
+      try {
+        const res = await fetch(`http://localhost:8000/suggest?q=${encodeURIComponent(text)}&limit=5`);
+        if (!res.ok) return;
+        const data = await res.json();
+        const items = data.suggestions || [];
+        setFilteredHistory(items);
+        setShowSuggestions(items.length > 0);
+      } catch (err) {
+        setShowSuggestions(false);
+      }
+    }, 150);
+  };
+
+  const postAsk = async (body) => {
+    const res = await fetch("http://localhost:8000/ask", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json"
+      },
+      body: JSON.stringify(body)
+    });
+
+    if (!res.ok) {
+      throw new Error(`API Error: ${res.status}`);
+    }
+
+    return res.json();
+  };
 
   const handleAsk = async () => {
     if (!query.trim()) return;
@@ -17,22 +56,17 @@ function App() {
     setLoading(true);
     setError('');
     setAnswer('');
+    setColumns([]);
+    setRows([]);
+    setNextCursor(null);
 
     try {
-      const res = await fetch("http://localhost:8000/ask", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json"
-        },
-        body: JSON.stringify({ query })
-      });
-
-      if (!res.ok) {
-        throw new Error(`API Error: ${res.status}`);
-      }
-
-      const data = await res.json();
+      const data = await postAsk({ query, session_id: sessionId, start_session: !sessionId });
+      if (data.session_id) setSessionId(data.session_id);
       setAnswer(data.answer);
+      setColumns(data.columns || []);
+      setRows(data.rows || []);
+      setNextCursor(data.next_cursor || null);
       setHistory(prev => [{ question: query, answer: data.answer }, ...prev]);
     } catch (err) {
       setError(err.message);
@@ -41,18 +75,35 @@ function App() {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+
+    setLoadingMore(true);
+    setError('');
+
+    try {
+      const data = await postAsk({ query, cursor: nextCursor });
+      setRows(prev => [...prev, ...(data.rows || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleNext = () => {
     setQuery('');
     setAnswer('');
     setError('');
+    setColumns([]);
+    setRows([]);
+    setNextCursor(null);
     setShowSuggestions(false);
   };
 
   const handleInputFocus = () => {
-    if (history.length > 0) {
-      setFilteredHistory(history.slice(0, 5)); // Show last 5 questions
-      setShowSuggestions(true);
-    }
+    fetchSuggestions(query);
   };
 
   const handleInputBlur = () => {
@@ -68,19 +119,7 @@ function App() {
   const handleInputChange = (e) => {
     const value = e.target.value;
     setQuery(value);
-    
-    if (value.trim() && history.length > 0) {
-      const filtered = history
-        .filter(item => item.question.toLowerCase().includes(value.toLowerCase()))
-        .slice(0, 5);
-      setFilteredHistory(filtered);
-      setShowSuggestions(filtered.length > 0);
-    } else if (value.trim() === '' && history.length > 0) {
-      setFilteredHistory(history.slice(0, 5));
-      setShowSuggestions(true);
-    } else {
-      setShowSuggestions(false);
-    }
+    fetchSuggestions(value);
   };
 
   const handleClearInput = () => {
@@ -141,6 +180,27 @@ function App() {
         <div className="response success">
           <strong>✅ Answer:</strong>
           <p>{answer}</p>
+          {rows.length > 0 && (
+            <table className="results-table">
+              <thead>
+                <tr>
+                  {columns.map(col => <th key={col}>{col}</th>)}
+                </tr>
+              </thead>
+              <tbody>
+                {rows.map((row, idx) => (
+                  <tr key={idx}>
+                    {row.map((value, cidx) => <td key={cidx}>{String(value)}</td>)}
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          )}
+          {nextCursor && (
+            <button className="next-btn" onClick={handleLoadMore} disabled={loadingMore}>
+              {loadingMore ? "Loading..." : "Load More"}
+            </button>
+          )}
           <button className="next-btn" onClick={handleNext}>
             Ask Next Question
           </button>